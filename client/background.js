@@ -36,7 +36,9 @@ async function fetchWithAuth(url, options = {}) {
 
     if (!response.ok) {
         const errorData = await response.json().catch(() => ({ detail: 'Unknown error' }));
-        throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+        const error = new Error(errorData.detail || `HTTP error! status: ${response.status}`);
+        error.status = response.status;
+        throw error;
     }
 
     return response.json();
@@ -45,7 +47,7 @@ async function fetchWithAuth(url, options = {}) {
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     switch (request.type) {
         case 'analyzeText':
-            handleAnalyzeText(request.payload, sendResponse);
+            handleAnalyzeText(request.payload, sender, sendResponse);
             break;
         case 'addWordToDictionary':
             handleAddWord(request.payload, sendResponse);
@@ -76,7 +78,179 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     return true;
 });
 
-function handleAnalyzeText(payload, sendResponse) {
+// Live analysis goes over one WebSocket session (/ws/analyze): it authenticates
+// once, sends each field's edits as deltas against the text the server already
+// holds, and gets back only the suggestions that changed. Plain POST /analyze/
+// is the fallback when the session can't be opened.
+const WS_ANALYZE_URL = `${API_BASE_URL.replace(/^http/, 'ws')}/ws/analyze`;
+const MAX_SESSION_FIELDS = 40;
+let analysisSession = null; // Promise of an authenticated WebSocket
+let analysisSocket = null;
+// field key -> { request, serverText, seq, suggestions: Map(id -> suggestion), pending: [{ seq, sendResponse }] }
+const sessionFields = new Map();
+
+function getAnalysisSession() {
+    if (!analysisSession) {
+        analysisSession = openAnalysisSession().catch((error) => {
+            analysisSession = null;
+            throw error;
+        });
+    }
+    return analysisSession;
+}
+
+async function openAnalysisSession() {
+    const token = await getToken();
+    if (!token) {
+        throw new Error('Not logged in.');
+    }
+    return new Promise((resolve, reject) => {
+        const socket = new WebSocket(WS_ANALYZE_URL);
+        socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token }));
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'ready') {
+                analysisSocket = socket;
+                resolve(socket);
+                return;
+            }
+            handleSessionMessage(socket, message);
+        };
+        socket.onerror = () => reject(new Error('Could not open the analysis session.'));
+        socket.onclose = () => {
+            reject(new Error('The analysis session was closed.'));
+            if (analysisSocket === socket) {
+                analysisSocket = null;
+                analysisSession = null;
+            }
+            // The server forgets every field with the session.
+            for (const field of sessionFields.values()) {
+                field.serverText = null;
+                settlePending(field, field.seq, { error: 'The analysis session was closed.' });
+            }
+        };
+    });
+}
+
+function textDelta(before, after) {
+    let start = 0;
+    while (start < before.length && start < after.length && before[start] === after[start]) {
+        start++;
+    }
+    const isLowSurrogate = (text, i) => i < text.length && text.charCodeAt(i) >= 0xDC00 && text.charCodeAt(i) <= 0xDFFF;
+    // Never split a surrogate pair: the server works in whole characters.
+    if (start > 0 && (isLowSurrogate(before, start) || isLowSurrogate(after, start))) {
+        start--;
+    }
+    let suffix = 0;
+    while (suffix < before.length - start && suffix < after.length - start
+        && before[before.length - 1 - suffix] === after[after.length - 1 - suffix]) {
+        suffix++;
+    }
+    if (suffix > 0 && isLowSurrogate(before, before.length - suffix)) {
+        suffix--;
+    }
+    return { start, end: before.length - suffix, text: after.slice(start, after.length - suffix) };
+}
+
+function sendFieldUpdate(socket, key, field) {
+    const { text, platform, enabled_analyzers, incremental } = field.request;
+    field.seq++;
+    const message = { type: 'analyze', field: key, seq: field.seq, platform, enabled_analyzers, incremental };
+    if (field.serverText === null) {
+        message.text = text;
+    } else {
+        message.delta = textDelta(field.serverText, text);
+        message.length = text.length;
+    }
+    field.serverText = text;
+    socket.send(JSON.stringify(message));
+}
+
+function analyzeInSession(socket, key, request, sendResponse) {
+    let field = sessionFields.get(key);
+    if (!field) {
+        if (sessionFields.size >= MAX_SESSION_FIELDS) {
+            closeSessionField(sessionFields.keys().next().value);
+        }
+        field = { serverText: null, seq: 0, suggestions: new Map(), pending: [] };
+        sessionFields.set(key, field);
+    }
+    field.request = request;
+    sendFieldUpdate(socket, key, field);
+    field.pending.push({ seq: field.seq, sendResponse });
+}
+
+function closeSessionField(key) {
+    const field = sessionFields.get(key);
+    if (!field) return;
+    sessionFields.delete(key);
+    settlePending(field, field.seq, { error: 'Analysis was cancelled.' });
+    if (analysisSocket && analysisSocket.readyState === WebSocket.OPEN) {
+        analysisSocket.send(JSON.stringify({ type: 'close', field: key }));
+    }
+}
+
+// Answers every request up to `seq`; the server only reports the newest result
+// for a field, so superseded requests get that one too.
+function settlePending(field, seq, response) {
+    field.pending = field.pending.filter((request) => {
+        if (request.seq > seq) return true;
+        request.sendResponse(response);
+        return false;
+    });
+}
+
+function handleSessionMessage(socket, message) {
+    const field = sessionFields.get(message.field);
+    if (!field) return;
+    if (message.type === 'result') {
+        message.removed.forEach(id => field.suggestions.delete(id));
+        message.added.forEach(suggestion => field.suggestions.set(suggestion.id, suggestion));
+        // Kept suggestions whose text shifted because of an edit before them.
+        (message.moved || []).forEach(({ id, start, end }) => {
+            const suggestion = field.suggestions.get(id);
+            if (suggestion) field.suggestions.set(id, { ...suggestion, start, end });
+        });
+        const suggestions = message.order.map(id => field.suggestions.get(id)).filter(Boolean);
+        settlePending(field, message.seq, { suggestions, analyzers: message.analyzers });
+    } else if (message.type === 'error') {
+        if (message.code === 'resync') {
+            // The server's copy of the text drifted from ours; send it in full.
+            field.serverText = null;
+            sendFieldUpdate(socket, message.field, field);
+            return;
+        }
+        settlePending(field, message.seq ?? field.seq, { error: message.detail });
+    }
+}
+
+chrome.tabs.onRemoved.addListener((tabId) => {
+    for (const key of [...sessionFields.keys()]) {
+        if (key.startsWith(`${tabId}:`)) {
+            closeSessionField(key);
+        }
+    }
+    for (const key of [...httpFieldSeqs.keys()]) {
+        if (key.startsWith(`${tabId}:`)) {
+            httpFieldSeqs.delete(key);
+        }
+    }
+});
+
+chrome.storage.onChanged.addListener((changes, area) => {
+    // A new login (or logout) needs a new session.
+    if (area === 'local' && changes.token && analysisSocket) {
+        analysisSocket.close();
+    }
+});
+
+// Identifies this browser session to /analyze/, which abandons a field's older
+// requests once a newer sequence number for it arrives.
+const CLIENT_SESSION_ID = crypto.randomUUID();
+const httpFieldSeqs = new Map();
+
+function handleAnalyzeText(payload, sender, sendResponse) {
     // Get user settings from sync storage
     chrome.storage.sync.get(['tonePreference', 'grammar', 'tone', 'style', 'seo'], async (settings) => {
         const requestPayload = {
@@ -84,6 +258,8 @@ function handleAnalyzeText(payload, sendResponse) {
             platform: payload.platform,
             field: payload.field,
             tone_preference: settings.tonePreference || 'professional',
+            // Only re-check sentences that changed since the last request
+            incremental: true,
             enabled_analyzers: {
                 grammar: settings.grammar !== false,
                 tone: settings.tone !== false,
@@ -92,13 +268,29 @@ function handleAnalyzeText(payload, sendResponse) {
             }
         };
 
+        const key = `${sender.tab ? sender.tab.id : 'extension'}:${payload.field}`;
+        try {
+            const socket = await getAnalysisSession();
+            analyzeInSession(socket, key, requestPayload, sendResponse);
+            return;
+        } catch (error) {
+            console.warn('WordWise: analysis session unavailable, using HTTP.', error);
+        }
+
+        const seq = (httpFieldSeqs.get(key) || 0) + 1;
+        httpFieldSeqs.set(key, seq);
         try {
             const data = await fetchWithAuth(`${API_BASE_URL}/analyze/`, {
                 method: 'POST',
-                body: JSON.stringify(requestPayload),
+                body: JSON.stringify({ ...requestPayload, field: key, session_id: CLIENT_SESSION_ID, seq }),
             });
             sendResponse(data);
         } catch (error) {
+            if (error.status === 409) {
+                // A newer request for this field is on its way; let it answer.
+                sendResponse({ superseded: true });
+                return;
+            }
             console.error('Error analyzing text:', error);
             sendResponse({ error: error.message });
         }
@@ -256,6 +256,9 @@ function findAndManageTextInputs() {
                 type: 'analyzeText',
                 payload: { text, platform: window.location.hostname, field: getFieldIdentifier(input) }
             }, (response) => {
+                if (response && response.superseded) {
+                    return;
+                }
                 if (chrome.runtime.lastError || !response || !response.suggestions) {
                     setIndicatorState(indicator, 'error');
                     indicator.wordwiseResponse = null;
@@ -571,6 +574,13 @@ function attachToneAdjustListeners(container, inputElement) {
         });
     };
 
+    // Until the user ticks or unticks an inspiration, the server picks similar ones itself.
+    inspirationsContainer.addEventListener('change', (e) => {
+        if (e.target.classList.contains('wordwise-inspiration-checkbox')) {
+            inspirationsContainer.dataset.selectionChanged = 'true';
+        }
+    });
+
     presetAdjective.addEventListener('change', () => loadInspirations(inspirationsContainer));
     customAdjective.addEventListener('focus', () => loadInspirations(inspirationsContainer), { once: true });
 
@@ -581,8 +591,9 @@ function attachToneAdjustListeners(container, inputElement) {
             return;
         }
 
-        const selectedInspirationIds = Array.from(inspirationsContainer.querySelectorAll('.wordwise-inspiration-checkbox:checked'))
-            .map(cb => parseInt(cb.value));
+        const selectedInspirationIds = inspirationsContainer.dataset.selectionChanged === 'true'
+            ? Array.from(inspirationsContainer.querySelectorAll('.wordwise-inspiration-checkbox:checked')).map(cb => parseInt(cb.value))
+            : null;
 
         suggestionsContainer.innerHTML = '<em>Generating AI suggestions...</em>';
         
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+import schemas
+from engine import AnalysisCancelled, AnalysisTicket, EngineSaturated
+from nlp.offsets import Utf16OffsetMap
+
+WS_ANALYZE_MAX_FIELDS = int(os.getenv("WS_ANALYZE_MAX_FIELDS", "50"))
+WS_ANALYZE_MAX_TEXT_CHARS = int(os.getenv("WS_ANALYZE_MAX_TEXT_CHARS", "100000"))
+
+_open_sessions = 0
+
+
+def open_sessions() -> int:
+    return _open_sessions
+
+
+class DeltaError(ValueError):
+    """A delta doesn't fit the server's copy of the text; the client must resend it in full."""
+
+
+def apply_delta(text: str, delta: schemas.TextDelta) -> str:
+    offsets = Utf16OffsetMap(text)
+    length = offsets.offset(len(text))
+    if delta.start > delta.end or delta.end > length:
+        raise DeltaError(f"Delta {delta.start}:{delta.end} is outside a text of length {length}.")
+    start, end = offsets.index(delta.start), offsets.index(delta.end)
+    return text[:start] + delta.text + text[end:]
+
+
+def utf16_length(text: str) -> int:
+    return Utf16OffsetMap(text).offset(len(text))
+
+
+def suggestion_ids(text: str, suggestions: List[dict]) -> List[str]:
+    """
+    Ids that survive edits elsewhere in the text: each hashes the suggestion
+    without its offsets, the text it covers, and how many identical ones come
+    before it.
+    """
+    offsets = Utf16OffsetMap(text)
+    occurrences = Counter()
+    ids = []
+    for suggestion in suggestions:
+        key = {k: v for k, v in suggestion.items() if k not in ("start", "end")}
+        if "start" in suggestion and "end" in suggestion:
+            key["matched"] = text[offsets.index(suggestion["start"]):offsets.index(suggestion["end"])]
+        identity = json.dumps(key, sort_keys=True)
+        key["occurrence"] = occurrences[identity]
+        occurrences[identity] += 1
+        ids.append(hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16])
+    return ids
+
+
+class FieldState:
+    def __init__(self, text: str):
+        self.text = text
+        self.seq = 0
+        self.platform: Optional[str] = None
+        self.enabled_analyzers: Optional[dict] = None
+        self.incremental = False
+        # suggestion id -> suggestion, as last pushed to the client
+        self.sent: Dict[str, dict] = {}
+        self.dirty = False
+        self.task: Optional[asyncio.Task] = None
+        # Cancelled when an edit makes the running analysis stale.
+        self.ticket: Optional[AnalysisTicket] = None
+
+
+class AnalysisSession:
+    """
+    Server side of one /ws/analyze connection, after authentication.
+
+    The client sends {"type": "analyze", "field", "seq", ...} with either the
+    field's full "text" or a "delta" against the text the server already holds,
+    plus optional "length" (UTF-16 length after the edit, to detect drift) and the
+    AnalysisRequest options (platform, enabled_analyzers, incremental), which
+    stick until changed. "seq" is required and must increase with every message
+    for the field; one that doesn't is rejected with a "stale_seq" error.
+    {"type": "close", "field"} forgets a field.
+
+    Each field is analyzed by at most one task at a time. An edit that arrives
+    while it runs cancels the run's ticket, so analyzers that haven't started are
+    skipped, and is folded into the next run; a result that has been overtaken by
+    a newer edit is never sent. Results go out as {"type": "result", "field",
+    "seq", "added", "removed", "moved", "order", "analyzers"}: suggestions the
+    client doesn't have yet (each with an "id"), ids of those that no longer
+    apply, {"id", "start", "end"} for kept ones whose offsets changed, and the
+    ids of the full list in analyze_text order. Ids don't depend on offsets, so
+    an edit before a suggestion only moves it. Problems are reported as
+    {"type": "error", "code", ...}; "resync" means the client should send the
+    field's full text.
+
+    handle() returns False once the session's token has expired; the caller
+    should then close the connection.
+    """
+
+    def __init__(self, analyze: Callable[[str, str, FieldState], Awaitable[dict]], send: Callable[[dict], Awaitable[None]], expires_at: Optional[float] = None):
+        self.analyze = analyze
+        self._send = send
+        self.expires_at = expires_at
+        self._send_lock = asyncio.Lock()
+        self.fields: Dict[str, FieldState] = {}
+
+    def __enter__(self):
+        global _open_sessions
+        _open_sessions += 1
+        return self
+
+    def __exit__(self, *exc):
+        global _open_sessions
+        _open_sessions -= 1
+        for state in self.fields.values():
+            self._stop(state)
+        self.fields.clear()
+
+    def _stop(self, state: FieldState):
+        if state.ticket is not None:
+            state.ticket.cancel()
+        if state.task is not None:
+            state.task.cancel()
+
+    async def send(self, message: dict):
+        async with self._send_lock:
+            await self._send(message)
+
+    async def error(self, code: str, detail: str, field: Optional[str] = None, seq: Optional[int] = None):
+        await self.send({"type": "error", "code": code, "detail": detail, "field": field, "seq": seq})
+
+    async def handle(self, raw: dict) -> bool:
+        if self.expires_at is not None and time.time() >= self.expires_at:
+            await self.error("token_expired", "The session's token has expired; reconnect with a new one.")
+            return False
+        try:
+            message = schemas.AnalysisSessionMessage(**raw)
+        except (TypeError, ValidationError) as e:
+            await self.error("invalid_message", str(e))
+            return True
+        if message.type == "analyze":
+            await self._update(message)
+        elif message.type == "close":
+            state = self.fields.pop(message.field, None)
+            if state is not None:
+                self._stop(state)
+        else:
+            await self.error("invalid_message", f"Unknown message type '{message.type}'.")
+        return True
+
+    async def _update(self, message: schemas.AnalysisSessionMessage):
+        field = message.field
+        if not field:
+            await self.error("invalid_message", "'field' is required.", seq=message.seq)
+            return
+        if message.seq is None:
+            await self.error("invalid_message", "'seq' is required.", field)
+            return
+        state = self.fields.get(field)
+        if state is None:
+            if message.text is None:
+                await self.error("resync", "Unknown field; send its full text.", field, message.seq)
+                return
+            if len(self.fields) >= WS_ANALYZE_MAX_FIELDS:
+                await self.error("too_many_fields", f"A session can track at most {WS_ANALYZE_MAX_FIELDS} fields.", field, message.seq)
+                return
+            state = FieldState("")
+        elif message.seq <= state.seq:
+            await self.error("stale_seq", f"'seq' must be greater than {state.seq}.", field, message.seq)
+            return
+
+        try:
+            if message.text is not None:
+                text = message.text
+            elif message.delta is not None:
+                text = apply_delta(state.text, message.delta)
+            else:
+                text = state.text
+            if message.length is not None and utf16_length(text) != message.length:
+                raise DeltaError("Text length doesn't match the client's.")
+        except DeltaError as e:
+            await self.error("resync", str(e), field, message.seq)
+            return
+        if len(text) > WS_ANALYZE_MAX_TEXT_CHARS:
+            await self.error("too_long", f"Texts are limited to {WS_ANALYZE_MAX_TEXT_CHARS} characters.", field, message.seq)
+            return
+
+        self.fields[field] = state
+        state.text = text
+        state.seq = message.seq
+        if message.platform is not None:
+            state.platform = message.platform
+        if message.enabled_analyzers is not None:
+            state.enabled_analyzers = message.enabled_analyzers
+        if message.incremental is not None:
+            state.incremental = message.incremental
+        state.dirty = True
+        if state.ticket is not None:
+            # The running analysis is for older text; abandon what's left of it.
+            state.ticket.cancel()
+        if state.task is None:
+            state.task = asyncio.create_task(self._run(field, state))
+
+    async def _run(self, field: str, state: FieldState):
+        try:
+            while state.dirty:
+                state.dirty = False
+                text, seq = state.text, state.seq
+                state.ticket = AnalysisTicket()
+                try:
+                    result = await self.analyze(field, text, state)
+                except AnalysisCancelled:
+                    continue
+                except EngineSaturated as e:
+                    state.dirty = True
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                except Exception as e:
+                    print(f"Error during session analysis: {e}")
+                    await self.error("analysis_failed", str(e), field, seq)
+                    continue
+                if state.dirty:
+                    continue
+                await self.send(self._diff(field, seq, text, state, result))
+        except Exception as e:
+            # Typically the connection closed while a result was being sent.
+            print(f"Stopped analysing field '{field}': {e}")
+        finally:
+            state.task = None
+            state.ticket = None
+
+    def _diff(self, field: str, seq: int, text: str, state: FieldState, result: dict) -> dict:
+        current = dict(zip(suggestion_ids(text, result["suggestions"]), result["suggestions"]))
+        added = [dict(s, id=sid) for sid, s in current.items() if sid not in state.sent]
+        removed = [sid for sid in state.sent if sid not in current]
+        moved = [
+            {"id": sid, "start": s.get("start"), "end": s.get("end")}
+            for sid, s in current.items()
+            if sid in state.sent and (s.get("start"), s.get("end")) != (state.sent[sid].get("start"), state.sent[sid].get("end"))
+        ]
+        state.sent = current
+        return {
+            "type": "result",
+            "field": field,
+            "seq": seq,
+            "added": added,
+            "removed": removed,
+            "moved": moved,
+            "order": list(current),
+            "analyzers": result["analyzers"],
+        }
+
+
+async def authenticate(receive: Callable[[], Awaitable[dict]], check_token: Callable[[str], Awaitable[Optional[Tuple]]], timeout: float) -> Optional[Tuple]:
+    """
+    Waits for the session's first message, {"type": "auth", "token": ...}, and
+    returns what `check_token` makes of the token, or None.
+    """
+    try:
+        raw = await asyncio.wait_for(receive(), timeout)
+        message = schemas.AnalysisSessionMessage(**raw)
+    except (asyncio.TimeoutError, TypeError, ValueError, ValidationError):
+        return None
+    if message.type != "auth" or not message.token:
+        return None
+    return await check_token(message.token)
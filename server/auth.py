@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from collections import OrderedDict
 import os
+import time
 from dotenv import load_dotenv
 
 from fastapi import Depends, HTTPException, status
@@ -21,6 +23,14 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
+# Decoded, validated tokens are cached briefly so keystroke-driven requests don't
+# decode the JWT and query the user on every call. The cache is per process:
+# a deactivated user's tokens are dropped only in the process that deactivated
+# them, and other workers keep accepting them for up to PRINCIPAL_CACHE_TTL.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+_principal_cache = OrderedDict()  # token -> (expires_at, schemas.Principal)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -60,26 +70,95 @@ async def get_user(db: AsyncSession, email: str):
     )
     return result.scalars().first()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+async def get_principal(db: AsyncSession, email: str):
+    result = await db.execute(
+        select(models.User.id, models.User.email, models.User.is_active)
+        .filter(models.User.email == email)
     )
+    row = result.first()
+    if row is None:
+        return None
+    return schemas.Principal(id=row.id, email=row.email, is_active=bool(row.is_active))
+
+def invalidate_principal(email: str):
+    """
+    Drops this process' cached tokens for `email`, e.g. after the user is
+    deactivated. Other workers' caches expire on their own.
+    """
+    for token in [t for t, (_, p) in _principal_cache.items() if p.email == email]:
+        del _principal_cache[token]
+
+def _cache_principal(token: str, principal: schemas.Principal, token_expires_at: Optional[float]):
+    expires_at = time.time() + PRINCIPAL_CACHE_TTL
+    if token_expires_at is not None:
+        expires_at = min(expires_at, token_expires_at)
+    _principal_cache[token] = (expires_at, principal)
+    while len(_principal_cache) > PRINCIPAL_CACHE_MAX_ENTRIES:
+        _principal_cache.popitem(last=False)
+
+def _decode_token(token: str, credentials_exception: HTTPException):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        return schemas.TokenData(email=email), payload.get("exp")
     except JWTError:
         raise credentials_exception
-    user = await get_user(db, email=token_data.email)
-    if user is None:
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    Resolves the bearer token to a lightweight schemas.Principal (id, email,
+    is_active) without loading the user's relationships.
+    """
+    cached = _principal_cache.get(token)
+    if cached is not None:
+        if cached[0] > time.time():
+            return cached[1]
+        del _principal_cache[token]
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data, token_expires_at = _decode_token(token, credentials_exception)
+    principal = await get_principal(db, email=token_data.email)
+    if principal is None:
         raise credentials_exception
-    return user
+    _cache_principal(token, principal, token_expires_at)
+    return principal
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+async def get_session_principal(token: str):
+    """
+    Validates a token sent inside a WebSocket session, where browsers can't set
+    an Authorization header. Returns (principal, token expiry timestamp) for an
+    active user, or None.
+    """
+    async with SessionLocal() as db:
+        try:
+            principal = await get_current_user(token, db)
+        except HTTPException:
+            return None
+    if not principal.is_active:
+        return None
+    return principal, jwt.get_unverified_claims(token).get("exp")
+
+async def get_current_active_user(current_user: schemas.Principal = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+async def get_current_active_user_with_inspirations(
+    current_user: schemas.Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Loads the full user, with inspirations, for endpoints that return it."""
+    user = await get_user(db, email=current_user.email)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user 
\ No newline at end of file
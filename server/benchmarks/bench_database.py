@@ -0,0 +1,135 @@
+"""
+Mixed read/write load against SQLite: concurrent readers paging inspirations and
+counting dictionary words while writers add dictionary words and inspirations,
+through the same crud functions the endpoints use.
+
+Compares the old engine settings (default rollback journal, synchronous=FULL,
+echo on, one commit per write) with WAL + synchronous=NORMAL, with and without
+the write-behind queue. Run from the server directory:
+
+    python -m benchmarks.bench_database [--seconds 5] [--readers 16] [--writers 8]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import database
+import models
+import schemas
+
+CONFIGS = [
+    # name, journal_mode, synchronous, echo, write_behind
+    ("before: DELETE journal, FULL, echo, commit per write", "DELETE", "FULL", True, False),
+    ("WAL, NORMAL", "WAL", "NORMAL", False, False),
+    ("WAL, NORMAL, write-behind", "WAL", "NORMAL", False, True),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def seed(session_factory, n_inspirations: int) -> int:
+    async with session_factory() as db:
+        user = models.User(email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        user_id = user.id
+        db.add_all(
+            models.Inspiration(post_text=f"Seed post {i} #launch", platform="instagram", tags="launch", user_id=user_id)
+            for i in range(n_inspirations)
+        )
+        await db.commit()
+        return user_id
+
+
+async def reader(session_factory, user_id, stop_at, latencies):
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        async with session_factory() as db:
+            await crud.get_inspirations(db, user_id=user_id, limit=20)
+            await crud.count_dictionary_words(db, user_id)
+        latencies.append(time.perf_counter() - started)
+
+
+async def writer(session_factory, user_id, stop_at, latencies, writer_id):
+    i = 0
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        async with session_factory() as db:
+            if i % 4 == 3:
+                await crud.create_inspiration(
+                    db, schemas.InspirationCreate(post_text=f"Writer {writer_id} post {i}", platform="x", tags="bench"), user_id
+                )
+            else:
+                await crud.add_word_to_dictionary(db, user_id, f"w{writer_id}x{i}")
+        latencies.append(time.perf_counter() - started)
+        i += 1
+
+
+async def run_config(path, journal_mode, synchronous, echo, write_behind, args):
+    url = f"sqlite+aiosqlite:///{path}"
+    engine = database.make_engine(url, echo=echo, journal_mode=journal_mode, synchronous=synchronous)
+    write_engine = database.make_engine(url, echo=echo, journal_mode=journal_mode, synchronous=synchronous, pool_size=1, max_overflow=0)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, autoflush=False)
+    database.WRITE_BEHIND_ENABLED = write_behind
+    database.write_behind = database.WriteBehindQueue(
+        sessionmaker(bind=write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    )
+
+    async with engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+        await conn.run_sync(database._create_search_index)
+    user_id = await seed(session_factory, args.inspirations)
+
+    read_latencies, write_latencies = [], []
+    stop_at = time.monotonic() + args.seconds
+    await asyncio.gather(
+        *(reader(session_factory, user_id, stop_at, read_latencies) for _ in range(args.readers)),
+        *(writer(session_factory, user_id, stop_at, write_latencies, w) for w in range(args.writers)),
+    )
+    await database.write_behind.close()
+    await engine.dispose()
+    await write_engine.dispose()
+    return {
+        "reads_per_s": len(read_latencies) / args.seconds,
+        "read_p50_ms": percentile(read_latencies, 50) * 1000,
+        "read_p95_ms": percentile(read_latencies, 95) * 1000,
+        "writes_per_s": len(write_latencies) / args.seconds,
+        "write_p50_ms": percentile(write_latencies, 50) * 1000,
+        "write_p95_ms": percentile(write_latencies, 95) * 1000,
+        "mean_write_batch": database.write_behind.stats()["mean_batch_size"] if write_behind else 1.0,
+    }
+
+
+async def main(args):
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s per config, {args.inspirations} seeded inspirations")
+    print(f"{'config':<55} {'reads/s':>9} {'r p50':>7} {'r p95':>7} {'writes/s':>9} {'w p50':>7} {'w p95':>7} {'batch':>6}")
+    for name, journal_mode, synchronous, echo, write_behind in CONFIGS:
+        # echo=True logs every statement to stdout; keep the cost, drop the output.
+        with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            r = await run_config(os.path.join(tmp, "bench.db"), journal_mode, synchronous, echo, write_behind, args)
+        print(
+            f"{name:<55} {r['reads_per_s']:>9.0f} {r['read_p50_ms']:>7.1f} {r['read_p95_ms']:>7.1f} "
+            f"{r['writes_per_s']:>9.0f} {r['write_p50_ms']:>7.1f} {r['write_p95_ms']:>7.1f} {r['mean_write_batch']:>6.1f}"
+        )
+    print("latencies in ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--inspirations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
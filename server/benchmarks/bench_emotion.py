@@ -0,0 +1,121 @@
+"""
+Accuracy vs. latency of the emotion classifier backends: the PyTorch
+transformers pipeline (the reference) and the int8 ONNX export.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_emotion [--batch-sizes 1,16] [--iterations 3] [--output emotion.json]
+
+Accuracy is measured as agreement with the PyTorch outputs on the corpus, which
+is what matters when switching EMOTION_BACKEND:
+
+- top1_agreement: same highest-scoring label
+- suggestion_agreement: same labels in the tone suggestion the API returns
+  (scores > 0.25, top 3)
+- mean/max_abs_score_diff: over every label's score
+
+Latency is per text, for each batch size. RSS growth is measured while each
+backend loads. The ONNX export is created first if it isn't cached, so
+that one-off cost isn't counted as load time.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.report import load_corpus, summarize, write_report
+from nlp.analysis import EMOTION_MODEL, EMOTION_ONNX_DIR, EMOTION_ONNX_THREADS, _emotion_from_scores
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def load(factory):
+    before = rss_mb()
+    started = time.perf_counter()
+    classifier = factory()
+    load_s = time.perf_counter() - started
+    after = rss_mb()
+    return classifier, {"load_s": load_s, "rss_growth_mb": (after - before) if before is not None and after is not None else None}
+
+
+def latency(classifier, texts, batch_size: int, iterations: int):
+    """Per-text latency: each batch's wall time divided over its texts."""
+    classifier(texts[:batch_size], batch_size=batch_size, truncation=True)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            t = time.perf_counter()
+            classifier(batch, batch_size=batch_size, truncation=True)
+            latencies.extend([(time.perf_counter() - t) / len(batch)] * len(batch))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def suggested_labels(scores):
+    return [e["label"] for e in (_emotion_from_scores(scores) or {}).get("emotions", [])]
+
+
+def agreement(reference, candidate):
+    top1 = suggestion = 0
+    diffs = []
+    for ref, cand in zip(reference, candidate):
+        top1 += ref[0]["label"] == cand[0]["label"]
+        suggestion += suggested_labels(ref) == suggested_labels(cand)
+        cand_scores = {e["label"]: e["score"] for e in cand}
+        diffs.extend(abs(e["score"] - cand_scores[e["label"]]) for e in ref)
+    n = len(reference)
+    return {
+        "texts": n,
+        "top1_agreement": top1 / n,
+        "suggestion_agreement": suggestion / n,
+        "mean_abs_score_diff": sum(diffs) / len(diffs),
+        "max_abs_score_diff": max(diffs),
+    }
+
+
+def main(args):
+    texts = [p["text"] for p in load_corpus()]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    from nlp.emotion_onnx import MODEL_FILE, OnnxEmotionClassifier, export_emotion_onnx
+    model_file = os.path.join(args.onnx_dir, MODEL_FILE)
+    if not os.path.exists(model_file):
+        # Export up front so the one-off export isn't counted as load time.
+        export_emotion_onnx(args.model, args.onnx_dir)
+    onnx, onnx_load = load(lambda: OnnxEmotionClassifier(args.onnx_dir, threads=EMOTION_ONNX_THREADS))
+
+    from transformers import pipeline
+    pytorch, pytorch_load = load(lambda: pipeline("text-classification", model=args.model, top_k=None))
+
+    results = {}
+    for name, classifier, loaded in (("pytorch", pytorch, pytorch_load), ("onnx", onnx, onnx_load)):
+        for batch_size in batch_sizes:
+            results[f"{name}.batch{batch_size}"] = dict(latency(classifier, texts, batch_size, args.iterations), **loaded)
+
+    reference = pytorch(texts, batch_size=16, truncation=True)
+    results["onnx.agreement"] = agreement(reference, onnx(texts, batch_size=16, truncation=True))
+
+    write_report("emotion", results, args.output, config={
+        "model": args.model,
+        "iterations": args.iterations,
+        "onnx_model_mb": os.path.getsize(model_file) / 1e6,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=EMOTION_MODEL)
+    parser.add_argument("--onnx-dir", default=EMOTION_ONNX_DIR)
+    parser.add_argument("--batch-sizes", default="1,16")
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the corpus per backend and batch size")
+    parser.add_argument("--output", help="write the JSON report here ('-' for stdout)")
+    main(parser.parse_args())
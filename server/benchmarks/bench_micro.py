@@ -0,0 +1,113 @@
+"""
+Micro-benchmarks over the bundled corpus: calculate_ari, UTF-16 offset
+conversion and each analyzer on its own, plus analyze_text end to end.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_micro [--iterations 5] [--output micro.json]
+
+Analyzers whose model can't be loaded (no spaCy model, no Java for
+LanguageTool, no network for the classifier) are reported as skipped.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.report import load_corpus, summarize, write_report
+from nlp import analysis
+from nlp.offsets import Utf16OffsetMap
+
+
+def run(fn, inputs, iterations: int):
+    """Calls fn(x) for every input, `iterations` times over, and summarizes per-call latency."""
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for x in inputs:
+            t = time.perf_counter()
+            try:
+                fn(x)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def spans_for(text: str, n: int = 10, seed: int = 0):
+    rng = random.Random(seed)
+    spans = []
+    for _ in range(n):
+        start = rng.randrange(0, max(1, len(text) - 8))
+        spans.append((start, min(len(text), start + rng.randint(1, 8))))
+    return spans
+
+
+def offsets_per_match(item):
+    text, spans = item
+    return [analysis.convert_offsets_to_utf16(text, start, end) for start, end in spans]
+
+
+def offsets_shared_map(item):
+    text, spans = item
+    offsets = Utf16OffsetMap(text)
+    return [offsets.span(start, end) for start, end in spans]
+
+
+def main(args):
+    posts = load_corpus()
+    texts = [p["text"] for p in posts]
+    with_spans = [(text, spans_for(text)) for text in texts]
+    results = {}
+
+    results["calculate_ari"] = run(analysis.calculate_ari, texts, args.iterations * 10)
+    results["offsets.per_match"] = run(offsets_per_match, with_spans, args.iterations * 10)
+    results["offsets.shared_map"] = run(offsets_shared_map, with_spans, args.iterations * 10)
+    results["readability"] = run(analysis._readability_suggestion, texts, args.iterations * 10)
+
+    models = {
+        "spacy": analysis.get_nlp,
+        "language_tool": analysis.get_tool,
+        "emotion_classifier": analysis.get_emotion_classifier,
+    }
+    loaded = {}
+    for name, getter in models.items():
+        try:
+            loaded[name] = getter() is not None
+        except Exception:
+            loaded[name] = False
+
+    analyzers = {
+        "passive_detection": ("spacy", lambda text: analysis._passive_spans(text, False)),
+        "passive_detection.incremental": ("spacy", lambda text: analysis._passive_spans(text, True)),
+        "grammar": ("language_tool", lambda text: analysis._grammar_suggestions(text, frozenset(), False, Utf16OffsetMap(text))),
+        "grammar.incremental": ("language_tool", lambda text: analysis._grammar_suggestions(text, frozenset(), True, Utf16OffsetMap(text))),
+        "tone": ("emotion_classifier", analysis._tone_suggestions),
+    }
+    for name, (model, fn) in analyzers.items():
+        if not loaded[model]:
+            results[name] = {"skipped": f"{model} not available"}
+            continue
+        # One untimed pass so lazy initialisation and (for incremental runs) the
+        # sentence cache don't depend on iteration order.
+        for text in texts:
+            fn(text)
+        results[name] = run(fn, texts, args.iterations)
+
+    if all(loaded.values()):
+        # Every pass after the first would be answered from the persistent cache.
+        analysis.analysis_cache = None
+        results["analyze_text"] = run(
+            lambda text: analysis.analyze_text(text, None, None, None), texts, args.iterations
+        )
+    else:
+        results["analyze_text"] = {"skipped": "not every model is available"}
+
+    write_report("micro", results, args.output, config={"iterations": args.iterations, "posts": len(texts), "models": loaded})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=5, help="passes over the corpus per model-backed benchmark")
+    parser.add_argument("--output", help="write the JSON report here ('-' for stdout)")
+    main(parser.parse_args())
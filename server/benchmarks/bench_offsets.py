@@ -0,0 +1,64 @@
+"""
+Micro-benchmark: per-match convert_offsets_to_utf16 vs. one shared Utf16OffsetMap.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_offsets
+"""
+import random
+import timeit
+
+from nlp.analysis import convert_offsets_to_utf16
+from nlp.offsets import Utf16OffsetMap
+
+EMOJI = ["😀", "🔥", "🚀", "✨", "💯", "🎉", "❤️", "👀", "🙌", "📸"]
+WORDS = ["launch", "today", "our", "new", "collection", "is", "live", "teh", "best", "summer", "vibes", "with", "friends", "#sunset", "#goodvibes"]
+
+
+def make_caption(n_words: int, emoji_every: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_words):
+        parts.append(rng.choice(WORDS))
+        if emoji_every and i % emoji_every == 0:
+            parts.append(rng.choice(EMOJI))
+    return " ".join(parts)
+
+
+def make_spans(text: str, n_spans: int, seed: int = 0):
+    rng = random.Random(seed)
+    spans = []
+    for _ in range(n_spans):
+        start = rng.randrange(0, max(1, len(text) - 10))
+        spans.append((start, start + rng.randint(1, 10)))
+    return spans
+
+
+def per_match(text, spans):
+    return [convert_offsets_to_utf16(text, start, end) for start, end in spans]
+
+
+def shared_map(text, spans):
+    offsets = Utf16OffsetMap(text)
+    return [offsets.span(start, end) for start, end in spans]
+
+
+def main():
+    cases = [
+        ("tweet, BMP only", make_caption(45, 0), 10),
+        ("tweet, emoji", make_caption(45, 4), 10),
+        ("caption, emoji-dense", make_caption(350, 2), 100),
+        ("long caption, emoji-dense", make_caption(2000, 2), 400),
+    ]
+    print(f"{'case':<28}{'chars':>7}{'spans':>7}{'per-match µs':>15}{'shared map µs':>15}{'speedup':>9}")
+    for name, text, n_spans in cases:
+        spans = make_spans(text, n_spans)
+        assert per_match(text, spans) == shared_map(text, spans)
+        number = 200
+        old = min(timeit.repeat(lambda: per_match(text, spans), number=number, repeat=5)) / number * 1e6
+        new = min(timeit.repeat(lambda: shared_map(text, spans), number=number, repeat=5)) / number * 1e6
+        print(f"{name:<28}{len(text):>7}{n_spans:>7}{old:>15.1f}{new:>15.1f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+A local stand-in for the OpenAI chat completions API, so the LLM endpoints can
+be load-tested offline and without cost. Point the server at it with
+
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake
+
+and run it from the server directory:
+
+    python -m benchmarks.fake_openai [--port 8765] [--latency-ms 400] [--jitter-ms 100] [--rate-limit 0.0] [--seed 0]
+
+Responses take latency-ms (+/- jitter-ms) to arrive; streamed responses spread
+that time across their chunks. --rate-limit answers that fraction of requests
+with a 429 to exercise the client's retry path. JSON-mode requests get a JSON
+object shaped for whichever prompt they came from.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+settings = {"latency_ms": 400.0, "jitter_ms": 100.0, "rate_limit": 0.0, "chunks": 12}
+counters = {"requests": 0, "rate_limited": 0}
+
+TONE_SUGGESTIONS = [
+    "1. Big news, friends: it's finally here and we can't wait for you to try it!",
+    "2. Guess what just landed? Spoiler: it's everything you asked for.",
+    "3. It's live. It's shiny. It's yours. Go take a look!",
+]
+
+
+def _json_content(messages) -> dict:
+    """Picks a JSON body matching the keys the calling helper's system prompt asks for."""
+    system = next((m["content"] for m in messages if m.get("role") == "system" and isinstance(m.get("content"), str)), "")
+    if '"captions"' in system:
+        return {"captions": ["Chasing golden hour ✨ #sunset", "Weekend mode: on 🌊", "Less scrolling, more strolling."]}
+    if "engagement_suggestions" in system:
+        return {
+            "engagement_suggestions": ["End with a question to invite replies.", "Add a clear call to action."],
+            "clarity_suggestions": ["Lead with the main point in the first sentence."],
+            "structure_suggestions": ["Move the hashtags to the end of the post."],
+        }
+    return {
+        "summary": "A clear, upbeat post with a solid hook but a weak call to action.",
+        "key_factors": ["Strong opening line", "Relevant hashtags"],
+        "recommendations": ["Ask a question to drive comments.", "Trim the hashtag list to the five most relevant."],
+    }
+
+
+def _usage(messages, completion: str) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _delay() -> float:
+    return max(0.0, settings["latency_ms"] + random.uniform(-settings["jitter_ms"], settings["jitter_ms"])) / 1000.0
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    if random.random() < settings["rate_limit"]:
+        counters["rate_limited"] += 1
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "requests"}}, status_code=429, headers={"retry-after": "0.2"})
+
+    messages = body.get("messages", [])
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = json.dumps(_json_content(messages)) if json_mode else "\n".join(TONE_SUGGESTIONS)
+    completion_id = f"chatcmpl-fake-{counters['requests']}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+
+    if not body.get("stream"):
+        await asyncio.sleep(_delay())
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": _usage(messages, content),
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        n = settings["chunks"]
+        step = max(1, len(content) // n)
+        pieces = [content[i:i + step] for i in range(0, len(content), step)]
+        pause = _delay() / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(pause)
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(done)}\n\n"
+        if include_usage:
+            usage = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [], "usage": _usage(messages, content),
+            }
+            yield f"data: {json.dumps(usage)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def stats():
+    return dict(counters, **settings)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=settings["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=settings["jitter_ms"])
+    parser.add_argument("--rate-limit", type=float, default=settings["rate_limit"], help="fraction of requests answered with 429")
+    parser.add_argument("--chunks", type=int, default=settings["chunks"], help="chunks per streamed response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    settings.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.rate_limit, chunks=args.chunks)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
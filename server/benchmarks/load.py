@@ -0,0 +1,226 @@
+"""
+End-to-end load generator for the HTTP API, driven by the bundled corpus.
+
+Against a running server:
+
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --scenarios analyze,tone-adjust
+
+or let it start everything itself (a fake OpenAI server, then the app on a
+throwaway database pointed at it), which is the reproducible setup to diff
+between commits:
+
+    python -m benchmarks.load --spawn --duration 20 --concurrency 8 --output load.json
+
+Each scenario runs for --duration seconds with --concurrency workers in a
+closed loop. The report has p50/p95/p99 latency, throughput and error counts
+per scenario. LLM requests set no_cache so every request reaches the (fake)
+model.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.report import load_corpus, summarize, write_report
+
+ADJECTIVES = ["witty", "bold", "heartfelt", "professional", "playful", "concise"]
+
+
+def _hashtags(text: str):
+    return [w for w in text.split() if w.startswith("#")]
+
+
+def _mentions(text: str):
+    return [w for w in text.split() if w.startswith("@")]
+
+
+def _batch_items(rng, posts):
+    return {"items": [{"text": p["text"], "platform": p["platform"]} for p in rng.sample(posts, min(10, len(posts)))]}
+
+
+# scenario -> (method, path, body builder(rng, post, posts))
+SCENARIOS = {
+    "analyze": ("POST", "/analyze/", lambda rng, post, posts: {"text": post["text"], "platform": post["platform"]}),
+    "analyze-incremental": ("POST", "/analyze/", lambda rng, post, posts: {"text": post["text"], "platform": post["platform"], "incremental": True}),
+    "analyze-batch": ("POST", "/analyze/batch", lambda rng, post, posts: _batch_items(rng, posts)),
+    "inspiration-create": ("POST", "/inspiration", lambda rng, post, posts: {
+        "post_text": post["text"], "platform": post["platform"], "tags": ",".join(_hashtags(post["text"])[:3]),
+    }),
+    "inspiration-list": ("GET", "/inspiration?limit=20", None),
+    "inspiration-search": ("GET", "/inspiration/search?q=launch", None),
+    "tone-adjust": ("POST", "/tone-adjust", lambda rng, post, posts: {
+        "text": post["text"], "adjective": rng.choice(ADJECTIVES), "no_cache": True,
+    }),
+    "analyze-post": ("POST", "/analyze-post", lambda rng, post, posts: {
+        "post_text": post["text"], "platform": post["platform"],
+        "hashtags": _hashtags(post["text"]), "mentions": _mentions(post["text"]), "no_cache": True,
+    }),
+    "improve-post": ("POST", "/improve-post", lambda rng, post, posts: {"post_text": post["text"], "no_cache": True}),
+}
+DEFAULT_SCENARIOS = "analyze,analyze-batch,inspiration-create,inspiration-list,tone-adjust,analyze-post,improve-post"
+
+
+async def login(client: httpx.AsyncClient) -> dict:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    password = uuid.uuid4().hex
+    # The user is created even if serializing the signup response fails, but a
+    # 500 can leave the connection unusable, so sign up on a throwaway client.
+    async with httpx.AsyncClient(base_url=client.base_url, timeout=client.timeout) as signup:
+        await signup.post("/signup", json={"email": email, "password": password})
+    response = await client.post("/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def worker(client, headers, scenario, posts, stop_at, latencies, errors, seed):
+    method, path, build = SCENARIOS[scenario]
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at:
+        post = rng.choice(posts)
+        body = build(rng, post, posts) if build else None
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body, headers=headers)
+            error = response.status_code if response.status_code >= 400 else None
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        if error is None:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors[error] = errors.get(error, 0) + 1
+
+
+async def run_scenario(client, headers, scenario, posts, args):
+    latencies, errors = [], {}
+    stop_at = time.monotonic() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, headers, scenario, posts, stop_at, latencies, errors, seed=args.seed + i)
+        for i in range(args.concurrency)
+    ))
+    result = summarize(latencies, time.perf_counter() - started, sum(errors.values()))
+    result["errors_by_status"] = {str(k): v for k, v in errors.items()}
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn(args, workdir: str):
+    """Starts the fake OpenAI server and the app; returns (base_url, processes)."""
+    server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    fake_port, app_port = _free_port(), _free_port()
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(fake_port),
+         "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms)],
+        cwd=server_dir,
+    )
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+        OPENAI_API_KEY="fake",
+        SECRET_KEY=os.getenv("SECRET_KEY", "benchmark-secret"),
+        DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(workdir, 'bench.db')}",
+        LLM_CACHE_BACKEND="none",
+        # Measure analysis, not lookups in a cache left over from an earlier pass or run.
+        ANALYSIS_CACHE_ENABLED="false",
+        ANALYSIS_CACHE_PATH=os.path.join(workdir, "analysis_cache.db"),
+    )
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"],
+        cwd=server_dir, env=env,
+    )
+    processes = [fake, app]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{fake_port}/stats")
+        base_url = f"http://127.0.0.1:{app_port}"
+        _wait_until_up(base_url + "/")
+        # Let model warmup finish (or fail) before measuring.
+        deadline = time.monotonic() + args.warmup_timeout
+        while time.monotonic() < deadline and httpx.get(base_url + "/ready").status_code != 200:
+            time.sleep(0.5)
+    except Exception:
+        for p in processes:
+            p.terminate()
+        raise
+    return base_url, processes
+
+
+async def main(args):
+    posts = load_corpus()
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Choose from: {', '.join(SCENARIOS)}")
+
+    processes = []
+    with tempfile.TemporaryDirectory() as workdir:
+        base_url = args.base_url
+        if args.spawn:
+            base_url, processes = spawn(args, workdir)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+                headers = await login(client)
+                results = {}
+                for scenario in scenarios:
+                    results[scenario] = await run_scenario(client, headers, scenario, posts, args)
+                try:
+                    server_stats = (await client.get("/stats")).json()
+                except Exception:
+                    server_stats = None
+        finally:
+            for p in processes:
+                p.terminate()
+                p.wait(timeout=10)
+
+    config = {
+        "base_url": None if args.spawn else base_url,
+        "spawned": args.spawn,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "seed": args.seed,
+        "llm_latency_ms": args.llm_latency_ms if args.spawn else None,
+        "server_stats": server_stats,
+    }
+    write_report("load", results, args.output, config=config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://127.0.0.1:8000")
+    target.add_argument("--spawn", action="store_true", help="start a fake OpenAI server and the app on a temporary database")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="fake OpenAI latency (--spawn only)")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0, help="fake OpenAI jitter (--spawn only)")
+    parser.add_argument("--warmup-timeout", type=float, default=120.0, help="seconds to wait for /ready (--spawn only)")
+    parser.add_argument("--output", help="write the JSON report here ('-' for stdout)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Shared helpers for the benchmark scripts: the bundled corpus, latency summaries
+and a JSON report format that can be diffed between commits.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus.json")
+
+
+def load_corpus(platform_name: Optional[str] = None) -> List[dict]:
+    """Returns the bundled posts, optionally only those for one platform ("x" or "instagram")."""
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        posts = json.load(f)
+    return [p for p in posts if platform_name is None or p["platform"] == platform_name]
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(p / 100.0 * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Latency percentiles in milliseconds and throughput in operations per second."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "mean_ms": (sum(values) / len(values) * 1000.0) if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000.0,
+        "p95_ms": percentile(values, 95) * 1000.0,
+        "p99_ms": percentile(values, 99) * 1000.0,
+        "max_ms": (values[-1] * 1000.0) if values else 0.0,
+        "throughput_per_s": (len(values) / elapsed) if elapsed > 0 else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def write_report(benchmark: str, results: Dict[str, dict], output: Optional[str], config: Optional[dict] = None):
+    """
+    Prints a one-line summary per result and, if `output` is given, writes the
+    full report as JSON (or "-" for stdout).
+    """
+    report = {
+        "benchmark": benchmark,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": config or {},
+        "results": results,
+    }
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<34} skipped: {r['skipped']}", file=sys.stderr)
+            continue
+        if "count" not in r:
+            values = " ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in r.items())
+            print(f"{name:<34} {values}", file=sys.stderr)
+            continue
+        print(
+            f"{name:<34} n={r['count']:<6} err={r['errors']:<4} p50={r['p50_ms']:>9.2f}ms "
+            f"p95={r['p95_ms']:>9.2f}ms p99={r['p99_ms']:>9.2f}ms {r['throughput_per_s']:>9.1f}/s",
+            file=sys.stderr,
+        )
+    if output == "-":
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
@@ -1,7 +1,16 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import func, delete, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 import models, schemas, auth
+from database import run_write
+from nlp.analysis_cache import DictionaryWords
 
 async def get_user(db: AsyncSession, user_id: int):
     result = await db.execute(select(models.User).filter(models.User.id == user_id))
@@ -19,18 +28,95 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
     await db.refresh(db_user)
     return db_user
 
+async def set_user_active(db: AsyncSession, user_id: int, is_active: bool):
+    db_user = await get_user(db, user_id=user_id)
+    if db_user is None:
+        return None
+    db_user.is_active = is_active
+    await db.commit()
+    await db.refresh(db_user)
+    # Cached principals would otherwise keep authenticating a deactivated user
+    # here; other workers keep theirs for up to auth.PRINCIPAL_CACHE_TTL.
+    auth.invalidate_principal(db_user.email)
+    return db_user
+
 async def get_user_dictionary(db: AsyncSession, user_id: int):
     result = await db.execute(
         select(models.UserWord).filter(models.UserWord.user_id == user_id)
     )
     return result.scalars().all()
 
+# Per-user dictionary cache: user_id -> (expires_at, frozenset of words). Entries are
+# dropped when this process changes the user's dictionary; the TTL bounds how long
+# other workers can serve a stale copy.
+DICTIONARY_CACHE_TTL = float(os.getenv("DICTIONARY_CACHE_TTL", "300"))
+DICTIONARY_CACHE_MAX_USERS = int(os.getenv("DICTIONARY_CACHE_MAX_USERS", "10000"))
+_dictionary_cache = OrderedDict()
+
+def invalidate_user_dictionary(user_id: int):
+    _dictionary_cache.pop(user_id, None)
+
+async def get_user_dictionary_words(db: AsyncSession, user_id: int) -> DictionaryWords:
+    entry = _dictionary_cache.get(user_id)
+    if entry is not None and entry[0] > time.monotonic():
+        _dictionary_cache.move_to_end(user_id)
+        return entry[1]
+
+    result = await db.execute(
+        select(models.UserWord.word).filter(models.UserWord.user_id == user_id)
+    )
+    words = DictionaryWords(result.scalars().all())
+    _dictionary_cache[user_id] = (time.monotonic() + DICTIONARY_CACHE_TTL, words)
+    _dictionary_cache.move_to_end(user_id)
+    while len(_dictionary_cache) > DICTIONARY_CACHE_MAX_USERS:
+        _dictionary_cache.popitem(last=False)
+    return words
+
 async def add_word_to_dictionary(db: AsyncSession, user_id: int, word: str):
-    db_word = models.UserWord(word=word, user_id=user_id)
-    db.add(db_word)
+    """Adds a word through the write-behind queue; a word the user already has is left alone."""
+    async def write(session):
+        await session.execute(
+            sqlite_insert(models.UserWord)
+            .values(user_id=user_id, word=word)
+            .on_conflict_do_nothing(index_elements=["user_id", "word"])
+        )
+
+    await run_write(write)
+    invalidate_user_dictionary(user_id)
+
+async def count_dictionary_words(db: AsyncSession, user_id: int) -> int:
+    result = await db.execute(
+        select(func.count()).select_from(models.UserWord).filter(models.UserWord.user_id == user_id)
+    )
+    return result.scalar_one()
+
+async def bulk_add_words_to_dictionary(db: AsyncSession, user_id: int, words: list[str]) -> int:
+    """
+    Inserts `words` in a single transaction, skipping ones the user already has
+    (via the unique (user_id, word) index). Returns how many were new, counted
+    from the rows this insert actually wrote, so concurrent adds don't skew it.
+    """
+    if not words:
+        return 0
+    result = await db.execute(
+        sqlite_insert(models.UserWord)
+        .on_conflict_do_nothing(index_elements=["user_id", "word"])
+        .returning(models.UserWord.id),
+        [{"user_id": user_id, "word": word} for word in words],
+    )
+    imported = len(result.all())
     await db.commit()
-    await db.refresh(db_word)
-    return db_word
+    invalidate_user_dictionary(user_id)
+    return imported
+
+async def stream_dictionary_words(db: AsyncSession, user_id: int):
+    result = await db.stream_scalars(
+        select(models.UserWord.word)
+        .filter(models.UserWord.user_id == user_id)
+        .order_by(models.UserWord.word)
+    )
+    async for word in result:
+        yield word
 
 async def get_word_in_dictionary(db: AsyncSession, user_id: int, word: str):
     result = await db.execute(
@@ -39,22 +125,92 @@ async def get_word_in_dictionary(db: AsyncSession, user_id: int, word: str):
     return result.scalars().first()
 
 # Inspiration CRUD
+def parse_tags(tags) -> list[str]:
+    """Splits a free-form, comma-separated tag string into normalized tags."""
+    if not tags:
+        return []
+    normalized = []
+    for tag in tags.split(","):
+        tag = tag.strip().lstrip("#").strip().lower()
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+async def _replace_inspiration_tags(db: AsyncSession, inspiration_id: int, user_id: int, tags):
+    await db.execute(delete(models.InspirationTag).where(models.InspirationTag.inspiration_id == inspiration_id))
+    tag_rows = [
+        {"inspiration_id": inspiration_id, "user_id": user_id, "tag": tag}
+        for tag in parse_tags(tags)
+    ]
+    if tag_rows:
+        await db.execute(sqlite_insert(models.InspirationTag), tag_rows)
+
+async def _bump_inspiration_version(db: AsyncSession, user_id: int) -> int:
+    """Advances the user's inspirations version; call inside the write's transaction."""
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(inspirations_version=models.User.inspirations_version + 1)
+        .returning(models.User.inspirations_version)
+    )
+    return result.scalar_one()
+
 async def create_inspiration(db: AsyncSession, inspiration: schemas.InspirationCreate, user_id: int):
-    db_inspiration = models.Inspiration(**inspiration.model_dump(), user_id=user_id)
-    db.add(db_inspiration)
-    await db.commit()
-    await db.refresh(db_inspiration)
-    return db_inspiration
+    """Returns (inspiration, the user's new inspirations version)."""
+    async def write(session):
+        db_inspiration = models.Inspiration(**inspiration.model_dump(), user_id=user_id)
+        session.add(db_inspiration)
+        await session.flush()
+        await _replace_inspiration_tags(session, db_inspiration.id, user_id, db_inspiration.tags)
+        version = await _bump_inspiration_version(session, user_id)
+        # Load the server-side timestamp before the transaction commits.
+        await session.refresh(db_inspiration)
+        return db_inspiration, version
 
-async def get_inspirations(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100):
+    return await run_write(write)
+
+async def get_inspirations(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 100,
+    before_id: Optional[int] = None,
+    tags: Optional[list[str]] = None,
+    platform: Optional[str] = None,
+):
+    """
+    Returns a page of the user's inspirations, newest first, using keyset
+    pagination on (user_id, id): pass the id of the last item of the previous
+    page as `before_id`. Filters to inspirations having every one of `tags`
+    and, optionally, the given platform.
+    """
+    query = select(models.Inspiration).filter(models.Inspiration.user_id == user_id)
+    if before_id is not None:
+        query = query.filter(models.Inspiration.id < before_id)
+    if platform:
+        query = query.filter(models.Inspiration.platform == platform)
+    for tag in parse_tags(",".join(tags or [])):
+        query = query.filter(models.Inspiration.id.in_(
+            select(models.InspirationTag.inspiration_id)
+            .filter(models.InspirationTag.user_id == user_id, models.InspirationTag.tag == tag)
+        ))
+    result = await db.execute(query.order_by(models.Inspiration.id.desc()).limit(limit))
+    return result.scalars().all()
+
+async def get_inspiration_texts(db: AsyncSession, user_id: int):
+    """Returns (id, post_text, tags) rows for every inspiration of the user."""
     result = await db.execute(
-        select(models.Inspiration)
+        select(models.Inspiration.id, models.Inspiration.post_text, models.Inspiration.tags)
         .filter(models.Inspiration.user_id == user_id)
-        .offset(skip)
-        .order_by(models.Inspiration.id.desc())
-        .limit(limit)
     )
-    return result.scalars().all()
+    return result.all()
+
+async def get_inspiration_version(db: AsyncSession, user_id: int) -> int:
+    """
+    The user's inspirations version, which every worker bumps whenever it adds,
+    deletes or edits one of their inspirations.
+    """
+    result = await db.execute(select(models.User.inspirations_version).filter(models.User.id == user_id))
+    return result.scalar_one_or_none() or 0
 
 async def get_inspiration(db: AsyncSession, inspiration_id: int, user_id: int):
     result = await db.execute(
@@ -63,22 +219,81 @@ async def get_inspiration(db: AsyncSession, inspiration_id: int, user_id: int):
     return result.scalars().first()
 
 async def delete_inspiration(db: AsyncSession, inspiration_id: int, user_id: int):
+    """Returns (inspiration, the user's new inspirations version), or None if not found."""
     db_inspiration = await get_inspiration(db, inspiration_id=inspiration_id, user_id=user_id)
     if db_inspiration:
+        await db.execute(delete(models.InspirationTag).where(models.InspirationTag.inspiration_id == inspiration_id))
         await db.delete(db_inspiration)
+        version = await _bump_inspiration_version(db, user_id)
         await db.commit()
-        return db_inspiration
+        return db_inspiration, version
     return None
 
 async def update_inspiration_tags(db: AsyncSession, inspiration_id: int, tags: str, user_id: int):
+    """Returns (inspiration, the user's new inspirations version), or None if not found."""
     db_inspiration = await get_inspiration(db, inspiration_id=inspiration_id, user_id=user_id)
     if db_inspiration:
         db_inspiration.tags = tags
+        await _replace_inspiration_tags(db, inspiration_id, user_id, tags)
+        version = await _bump_inspiration_version(db, user_id)
         await db.commit()
         await db.refresh(db_inspiration)
-        return db_inspiration
+        return db_inspiration, version
     return None
 
+def _fts_query(query: str) -> Optional[str]:
+    """
+    Turns free text into a safe FTS5 expression: every word becomes a quoted
+    term (so FTS syntax in user input is matched literally), all terms must
+    match, and the last one also matches as a prefix for search-as-you-type.
+    """
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " AND ".join(terms)
+
+async def search_inspirations(db: AsyncSession, user_id: int, query: str, limit: int = 20):
+    """
+    Full-text search over the user's inspirations (post text and tags).
+    Returns (inspiration, snippet, score) tuples, best match first; lower BM25
+    scores are better.
+    """
+    match = _fts_query(query)
+    if match is None:
+        return []
+    result = await db.execute(
+        text(
+            "SELECT rowid AS id, bm25(inspirations_fts, 1.0, 0.5, 0.0) AS score, "
+            "snippet(inspirations_fts, 0, '<b>', '</b>', '…', 16) AS snippet "
+            "FROM inspirations_fts "
+            "WHERE inspirations_fts MATCH :match "
+            "ORDER BY score LIMIT :limit"
+        ),
+        {"match": f'owner:"u{user_id}" AND {{post_text tags}}: ({match})', "limit": limit},
+    )
+    hits = result.all()
+    inspirations = {i.id: i for i in await get_inspirations_by_ids(db, [hit.id for hit in hits], user_id)}
+    return [(inspirations[hit.id], hit.snippet, hit.score) for hit in hits if hit.id in inspirations]
+
+async def backfill_inspiration_tags(db: AsyncSession):
+    """Fills inspiration_tags from the raw tag strings on first run after the upgrade."""
+    has_tags = await db.execute(select(models.InspirationTag.inspiration_id).limit(1))
+    if has_tags.first() is not None:
+        return
+    result = await db.execute(
+        select(models.Inspiration.id, models.Inspiration.user_id, models.Inspiration.tags)
+        .filter(models.Inspiration.tags.isnot(None), models.Inspiration.tags != "")
+    )
+    tag_rows = [
+        {"inspiration_id": row.id, "user_id": row.user_id, "tag": tag}
+        for row in result
+        for tag in parse_tags(row.tags)
+    ]
+    if tag_rows:
+        await db.execute(sqlite_insert(models.InspirationTag), tag_rows)
+        await db.commit()
+
 async def get_inspirations_by_ids(db: AsyncSession, inspiration_ids: list[int], user_id: int):
     if not inspiration_ids:
         return []
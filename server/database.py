@@ -1,15 +1,277 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite+aiosqlite:///./wordwise.db"
+from metrics import DB_QUERY_SECONDS
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./wordwise.db")
+# Logs every statement synchronously; only for debugging.
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "false").lower() in ("1", "true", "yes")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "8"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+# WAL lets readers run alongside the (single) writer; NORMAL only fsyncs at
+# checkpoints in WAL mode, which can lose the last commits on power loss but
+# never corrupts the database.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Write-behind batching of small inserts (see WriteBehindQueue).
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "64"))
+WRITE_BEHIND_MAX_WAIT_MS = float(os.getenv("WRITE_BEHIND_MAX_WAIT_MS", "5"))
+
+def make_engine(
+    url: str = DATABASE_URL,
+    echo: bool = DATABASE_ECHO,
+    journal_mode: str = SQLITE_JOURNAL_MODE,
+    synchronous: str = SQLITE_SYNCHRONOUS,
+    busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS,
+    pool_size: int = DATABASE_POOL_SIZE,
+    max_overflow: int = DATABASE_MAX_OVERFLOW,
+):
+    """Creates the async engine, applying the SQLite pragmas to every new connection."""
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and parsed.database in (None, "", ":memory:")
+    kwargs = {}
+    if not in_memory:
+        kwargs.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DATABASE_POOL_TIMEOUT,
+        )
+    new_engine = create_async_engine(url, echo=echo, **kwargs)
+
+    if is_sqlite:
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if journal_mode and not in_memory:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            if synchronous:
+                cursor.execute(f"PRAGMA synchronous={synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+            cursor.close()
+
+    @event.listens_for(new_engine.sync_engine, "before_cursor_execute")
+    def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(new_engine.sync_engine, "after_cursor_execute")
+    def _observe_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        statement_type = statement.split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=statement_type)
+
+    @event.listens_for(new_engine.sync_engine, "handle_error")
+    def _drop_query_timer(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+    return new_engine
+
+engine = make_engine()
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine, class_=AsyncSession
 )
 Base = declarative_base()
 
+class WriteBehindQueue:
+    """
+    Groups small writes from concurrent requests into one transaction.
+
+    A write is an async callable taking a session. Callers `await submit(op)` and
+    get the op's return value once the transaction containing it has committed,
+    so nothing is acknowledged before it is durable. The first write opens a
+    batch window; the batch commits when it reaches `max_batch` ops or after
+    `max_wait_ms`. If a batch fails, its ops are retried one transaction each so
+    a single bad write only fails its own caller.
+    """
+
+    def __init__(self, session_factory, max_batch: int = WRITE_BEHIND_MAX_BATCH, max_wait_ms: float = WRITE_BEHIND_MAX_WAIT_MS):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._batches = 0
+        self._writes = 0
+        self._fallbacks = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, op):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                # Skip callers that gave up (e.g. the client disconnected) before the write.
+                pending = [(op, future) for op, future in batch if not future.done()]
+                if pending:
+                    await self._write(pending)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch):
+        self._batches += 1
+        self._writes += len(batch)
+        try:
+            async with self.session_factory() as session:
+                results = [await op(session) for op, _ in batch]
+                await session.commit()
+        except Exception as e:
+            print(f"Batched write of {len(batch)} ops failed ({e.__class__.__name__}), retrying individually...")
+            self._fallbacks += 1
+            for op, future in batch:
+                try:
+                    result = await self.write_now(op)
+                except Exception as op_error:
+                    if not future.done():
+                        future.set_exception(op_error)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def write_now(self, op):
+        """Runs one op in its own transaction, bypassing the queue."""
+        async with self.session_factory() as session:
+            result = await op(session)
+            await session.commit()
+        return result
+
+    async def close(self):
+        """Waits for everything queued to be committed, then stops the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        self._worker = None
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self._batches,
+            "writes": self._writes,
+            "mean_batch_size": (self._writes / self._batches) if self._batches else 0.0,
+            "fallbacks": self._fallbacks,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+def _make_write_engine():
+    """
+    SQLite allows one writer at a time, so writes get their own single
+    connection. Callers wait on the queue while holding a request session, so
+    sharing the request pool could leave the writer without a connection.
+    """
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return engine
+    return make_engine(engine.url.render_as_string(hide_password=False), pool_size=1, max_overflow=0)
+
+write_engine = _make_write_engine()
+# Objects returned from a write stay usable after its commit.
+write_behind = WriteBehindQueue(
+    sessionmaker(autocommit=False, autoflush=False, bind=write_engine, class_=AsyncSession, expire_on_commit=False)
+)
+
+async def run_write(op):
+    """
+    Runs a write op through the write-behind queue, or in its own transaction
+    when WRITE_BEHIND_ENABLED is off.
+    """
+    if WRITE_BEHIND_ENABLED:
+        return await write_behind.submit(op)
+    return await write_behind.write_now(op)
+
+def _upgrade_schema(sync_conn):
+    """
+    create_all only adds columns and indexes when it creates a table, so ones
+    introduced later are added here for existing databases.
+    """
+    user_columns = {column["name"] for column in inspect(sync_conn).get_columns("users")}
+    if "inspirations_version" not in user_columns:
+        sync_conn.exec_driver_sql("ALTER TABLE users ADD COLUMN inspirations_version INTEGER NOT NULL DEFAULT 0")
+    # The unique (user_id, word) index can't be built over duplicate rows, so
+    # they're removed once, just before the index is created.
+    user_word_indexes = {index["name"] for index in inspect(sync_conn).get_indexes("user_words")}
+    if "ix_user_words_user_id_word" not in user_word_indexes:
+        sync_conn.exec_driver_sql(
+            "DELETE FROM user_words WHERE id NOT IN "
+            "(SELECT MIN(id) FROM user_words GROUP BY user_id, word)"
+        )
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+# Full-text index over saved inspirations. It stores its own copy of the text plus
+# an `owner` token ("u<user_id>") so a search only walks the caller's rows; the
+# triggers keep it in sync with every insert, update and delete on inspirations.
+_INSPIRATIONS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS inspirations_fts USING fts5("
+    "post_text, tags, owner, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS inspirations_fts_ai AFTER INSERT ON inspirations BEGIN "
+    "INSERT INTO inspirations_fts(rowid, post_text, tags, owner) "
+    "VALUES (new.id, new.post_text, new.tags, 'u' || new.user_id); END",
+    "CREATE TRIGGER IF NOT EXISTS inspirations_fts_ad AFTER DELETE ON inspirations BEGIN "
+    "DELETE FROM inspirations_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS inspirations_fts_au AFTER UPDATE OF post_text, tags, user_id ON inspirations BEGIN "
+    "UPDATE inspirations_fts SET post_text = new.post_text, tags = new.tags, owner = 'u' || new.user_id "
+    "WHERE rowid = old.id; END",
+]
+
+def _create_search_index(sync_conn):
+    if sync_conn.dialect.name != "sqlite":
+        return
+    exists = sync_conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'inspirations_fts'"
+    ).first()
+    for statement in _INSPIRATIONS_FTS_DDL:
+        sync_conn.exec_driver_sql(statement)
+    if not exists:
+        sync_conn.exec_driver_sql(
+            "INSERT INTO inspirations_fts(rowid, post_text, tags, owner) "
+            "SELECT id, post_text, tags, 'u' || user_id FROM inspirations"
+        )
+
 async def init_db():
     async with engine.begin() as conn:
         # await conn.run_sync(Base.metadata.drop_all) # Use this to drop tables for a fresh start
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+        await conn.run_sync(_create_search_index) 
\ No newline at end of file
@@ -0,0 +1,152 @@
+import asyncio
+import functools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import Hashable, Optional
+
+from metrics import ANALYSES_CANCELLED
+
+# Number of threads running analyses concurrently, and how many more may wait for
+# a free thread before new work is rejected.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(min(4, os.cpu_count() or 1))))
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "16"))
+ANALYSIS_RETRY_AFTER = int(os.getenv("ANALYSIS_RETRY_AFTER", "2"))
+# How many client fields' latest sequence numbers are remembered per process.
+SUPERSEDE_MAX_FIELDS = int(os.getenv("SUPERSEDE_MAX_FIELDS", "10000"))
+
+
+class EngineSaturated(Exception):
+    """Raised when the analysis queue is full and the caller should retry later."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Analysis queue is full.")
+        self.retry_after = retry_after
+
+
+class AnalysisCancelled(Exception):
+    """Raised from an analysis that was superseded by a newer one for the same field."""
+
+
+class AnalysisTicket:
+    """
+    Handle for abandoning one analysis from another thread. The analysis calls
+    check() between stages and waits on `waiter` alongside its own work, so
+    cancel() stops it at the next stage boundary (work already running on a
+    thread can't be interrupted and just finishes unused).
+    """
+
+    def __init__(self):
+        self.waiter = Future()
+
+    def cancel(self):
+        try:
+            self.waiter.set_result(None)
+        except InvalidStateError:
+            pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self.waiter.done()
+
+    def check(self, stage: str):
+        if self.cancelled:
+            ANALYSES_CANCELLED.inc(stage=stage)
+            raise AnalysisCancelled(stage)
+
+
+class SupersedeRegistry:
+    """
+    Newest request sequence number per client field, so that only the newest
+    analysis of a field is computed. begin() for a newer sequence cancels the
+    ticket of the analysis still running for that field; a request that arrives
+    behind a newer one gets no ticket at all. State is per process.
+    """
+
+    def __init__(self, max_fields: int = SUPERSEDE_MAX_FIELDS):
+        self.max_fields = max_fields
+        self._lock = threading.Lock()
+        # field key -> (latest seq, ticket of its running analysis or None)
+        self._fields = OrderedDict()
+
+    def begin(self, key: Hashable, seq: int) -> Optional[AnalysisTicket]:
+        with self._lock:
+            latest = self._fields.get(key)
+            if latest is not None and seq < latest[0]:
+                ANALYSES_CANCELLED.inc(stage="received")
+                return None
+            ticket = AnalysisTicket()
+            self._fields[key] = (seq, ticket)
+            self._fields.move_to_end(key)
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        if latest is not None and latest[1] is not None:
+            latest[1].cancel()
+        return ticket
+
+    def finish(self, key: Hashable, ticket: AnalysisTicket):
+        with self._lock:
+            current = self._fields.get(key)
+            if current is not None and current[1] is ticket:
+                self._fields[key] = (current[0], None)
+
+
+class AnalysisEngine:
+    """
+    Runs blocking, CPU-heavy analysis work on a bounded thread pool so the event
+    loop stays free for auth, dictionary and inspiration requests.
+
+    At most `workers` jobs run at once and at most `queue_size` more wait for a
+    thread; anything beyond that is rejected with EngineSaturated.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, queue_size: int = ANALYSIS_QUEUE_SIZE, retry_after: int = ANALYSIS_RETRY_AFTER):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, func, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise EngineSaturated(self.retry_after)
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Release the slot when the job actually finishes, not when the awaiting
+        # request goes away, so abandoned work still counts against capacity.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+analysis_engine = AnalysisEngine()
+supersede_registry = SupersedeRegistry()
@@ -1,24 +1,106 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Query, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+import asyncio
+import json
+import os
 
-from nlp.analysis import analyze_text, adjust_tone_with_ai, analyze_post_with_ai, improve_post_with_ai, generate_image_caption
+from nlp.analysis import analyze_text, analyze_texts, adjust_tone_with_ai, adjust_tone_with_ai_stream, analyze_post_with_ai, improve_post_with_ai, generate_image_caption, emotion_batcher, warmup, is_ready, model_status, language_tool_stats, close_models, analysis_cache
+from nlp import llm
+from nlp.llm_cache import llm_cache
+from nlp.similarity import similarity_index
+from nlp.images import prepare_image, InvalidImage, caption_cache, IMAGE_MAX_UPLOAD_BYTES
+import metrics
 import auth
 import crud
 import models
 import schemas
-from database import engine, init_db
+from database import engine, init_db, SessionLocal, write_behind
+from engine import analysis_engine, supersede_registry, EngineSaturated, AnalysisCancelled
+from analysis_session import AnalysisSession, authenticate as authenticate_session, open_sessions
 
 app = FastAPI()
 # This will create the tables
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    async with SessionLocal() as db:
+        await crud.backfill_inspiration_tags(db)
+    # Models load lazily; by default warm them in the background so the worker
+    # accepts connections immediately and /ready flips once every model has
+    # loaded or failed.
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes"):
+        asyncio.get_running_loop().run_in_executor(None, warmup).add_done_callback(_log_warmup)
 
+def _log_warmup(future):
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        print(f"Startup warmup failed: {future.exception()}")
+    else:
+        print(f"Startup warmup finished: {future.result()}")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await write_behind.close()
+    analysis_engine.shutdown()
+    close_models()
+    await llm.aclose()
+
+
+# Room in a caption upload's body for the form fields and multipart framing; the
+# image part itself is held to IMAGE_MAX_UPLOAD_BYTES by the endpoint.
+CAPTION_FORM_OVERHEAD_BYTES = 64 * 1024
+
+class BodyLimitMiddleware:
+    """
+    Rejects request bodies over `max_bytes` on `paths` with a 413 before the
+    multipart parser spools them: at once when Content-Length is too large, or as
+    soon as a streamed body goes past the limit.
+    """
+
+    def __init__(self, app, paths: List[str], max_bytes: int):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    def _too_large(self):
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds the upload limit of {self.max_bytes} bytes.",
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            error = self._too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parser; FastAPI passes HTTPExceptions on.
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(BodyLimitMiddleware, paths=["/caption/generate"], max_bytes=IMAGE_MAX_UPLOAD_BYTES + CAPTION_FORM_OVERHEAD_BYTES)
 
 # CORS middleware to allow requests from the Chrome extension
 origins = [
@@ -56,7 +138,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me/", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user_with_inspirations)):
     return current_user
 
 class AnalysisRequest(BaseModel):
@@ -65,26 +147,169 @@ class AnalysisRequest(BaseModel):
     field: Optional[str] = None
     tone_preference: Optional[str] = 'professional'
     enabled_analyzers: Optional[dict] = None
+    incremental: Optional[bool] = False
+    # Client-generated id of the page/extension session plus a per-field sequence
+    # number; with both set, a newer request for the same field supersedes this one.
+    session_id: Optional[str] = None
+    seq: Optional[int] = None
+
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "100"))
+
+class AnalysisBatchRequest(BaseModel):
+    items: List[AnalysisRequest]
+
+metrics.registry.gauge("wordwise_analysis_in_flight", "Analyses running on the analysis engine.", lambda: analysis_engine.stats()["in_flight"])
+metrics.registry.gauge("wordwise_analysis_queued", "Analyses waiting for an analysis engine worker.", lambda: analysis_engine.stats()["queued"])
+metrics.registry.gauge("wordwise_emotion_batch_queued", "Texts waiting for the emotion classifier.", lambda: emotion_batcher.stats()["queued"])
+metrics.registry.gauge("wordwise_write_behind_queued", "Writes waiting for the next batched commit.", lambda: write_behind.stats()["queued"])
+metrics.registry.gauge("wordwise_llm_in_flight", "OpenAI calls currently in flight.", llm.in_flight)
+metrics.registry.gauge("wordwise_analysis_sessions", "Open /ws/analyze sessions.", open_sessions)
+metrics.registry.gauge("wordwise_languagetool_healthy", "LanguageTool instances accepting checks.", lambda: (language_tool_stats() or {}).get("healthy", 0))
+metrics.registry.gauge("wordwise_languagetool_in_flight", "Grammar checks running on LanguageTool instances.", lambda: sum(n or 0 for n in (language_tool_stats() or {}).get("in_flight", [])))
 
 @app.get("/")
 def read_root():
     return {"message": "WordWise AI Server is running."}
 
+@app.get("/ready")
+def read_ready():
+    if not is_ready():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail={"ready": False, "models": model_status()})
+    return {"ready": True, "models": model_status()}
+
+@app.post("/warmup")
+async def run_warmup():
+    models_loaded = await asyncio.get_running_loop().run_in_executor(None, warmup)
+    return {"ready": is_ready(), "models": models_loaded}
+
+@app.get("/stats")
+def read_stats():
+    return {
+        "analysis_engine": analysis_engine.stats(),
+        "emotion_batching": emotion_batcher.stats(),
+        "llm_cache": llm_cache.stats(),
+        "write_behind": write_behind.stats(),
+        "caption_cache": caption_cache.stats(),
+        "language_tool": language_tool_stats(),
+        "analysis_cache": analysis_cache.stats() if analysis_cache is not None else None,
+    }
+
+@app.get("/metrics")
+def read_metrics():
+    """Prometheus scrape endpoint."""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/analyze/")
-async def analyze(request: AnalysisRequest, current_user: models.User = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
-    user_dictionary = await crud.get_user_dictionary(db, user_id=current_user.id)
-    dictionary_words = [item.word for item in user_dictionary]
-    
-    return analyze_text(
-        request.text,
-        request.platform,
-        request.field,
-        request.enabled_analyzers,
-        dictionary_words
-    )
+async def analyze(request: AnalysisRequest, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
+    """
+    Analyzes one text. Requests that carry `session_id` and `seq` are superseded
+    by a newer `seq` for the same field: whatever work is left of the older one
+    is abandoned and it gets a 409.
+    """
+    ticket = None
+    if request.session_id is not None and request.seq is not None:
+        supersede_key = (current_user.id, request.session_id, request.field)
+        ticket = supersede_registry.begin(supersede_key, request.seq)
+        if ticket is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Superseded by a newer request for this field.")
+
+    try:
+        dictionary_words = await crud.get_user_dictionary_words(db, user_id=current_user.id)
+        return await analysis_engine.run(
+            analyze_text,
+            request.text,
+            request.platform,
+            request.field,
+            request.enabled_analyzers,
+            dictionary_words,
+            incremental=bool(request.incremental),
+            ticket=ticket
+        )
+    except AnalysisCancelled:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Superseded by a newer request for this field.")
+    except EngineSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis server is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    finally:
+        if ticket is not None:
+            supersede_registry.finish(supersede_key, ticket)
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: AnalysisBatchRequest, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
+    """
+    Analyzes many drafts in one request. Returns {"results": [...]} with one
+    /analyze/-style result per item, in request order.
+    """
+    if len(request.items) > ANALYZE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {ANALYZE_BATCH_MAX_ITEMS} items.")
+    if not request.items:
+        return {"results": []}
+
+    dictionary_words = await crud.get_user_dictionary_words(db, user_id=current_user.id)
+
+    try:
+        results = await analysis_engine.run(
+            analyze_texts,
+            [(item.text, item.enabled_analyzers) for item in request.items],
+            dictionary_words,
+        )
+    except EngineSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis server is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return {"results": results}
+
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+
+@app.websocket("/ws/analyze")
+async def analyze_session(websocket: WebSocket):
+    """
+    Live analysis over one connection: the client authenticates once with
+    {"type": "auth", "token": ...}, then streams per-field edits and gets back
+    only the suggestions that changed. See analysis_session.AnalysisSession for
+    the protocol.
+    """
+    await websocket.accept()
+    authenticated = await authenticate_session(websocket.receive_json, auth.get_session_principal, WS_AUTH_TIMEOUT)
+    if authenticated is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    principal, expires_at = authenticated
+    await websocket.send_json({"type": "ready"})
+
+    async def analyze(field, text, state):
+        async with SessionLocal() as db:
+            dictionary_words = await crud.get_user_dictionary_words(db, user_id=principal.id)
+        return await analysis_engine.run(
+            analyze_text,
+            text,
+            state.platform,
+            field,
+            state.enabled_analyzers,
+            dictionary_words,
+            incremental=state.incremental,
+            ticket=state.ticket
+        )
+
+    with AnalysisSession(analyze, websocket.send_json, expires_at=expires_at) as session:
+        try:
+            while await session.handle(await websocket.receive_json()):
+                pass
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+        except WebSocketDisconnect:
+            pass
+        except ValueError as e:
+            # Not JSON.
+            print(f"Closing analysis session: {e}")
+            await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
 
 @app.post("/dictionary/add", status_code=status.HTTP_201_CREATED)
-async def add_to_dictionary(word_data: schemas.WordCreate, current_user: models.User = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
+async def add_to_dictionary(word_data: schemas.WordCreate, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
     word = word_data.word.strip()
     if not word or len(word.split()) > 1:
         raise HTTPException(status_code=400, detail="Invalid word provided.")
@@ -96,33 +321,96 @@ async def add_to_dictionary(word_data: schemas.WordCreate, current_user: models.
     await crud.add_word_to_dictionary(db, user_id=current_user.id, word=word)
     return {"message": f"'{word}' added to your dictionary."}
 
+@app.post("/dictionary/import", response_model=schemas.WordListImportResult)
+async def import_dictionary(word_list: schemas.WordListImport, current_user: schemas.Principal = Depends(auth.get_current_active_user), db: AsyncSession = Depends(auth.get_db)):
+    words = []
+    invalid = []
+    seen = set()
+    for raw in word_list.words:
+        word = raw.strip()
+        if not word or len(word.split()) > 1:
+            invalid.append(raw)
+        elif word not in seen:
+            seen.add(word)
+            words.append(word)
+
+    imported = await crud.bulk_add_words_to_dictionary(db, user_id=current_user.id, words=words)
+    return {"imported": imported, "skipped": len(words) - imported, "invalid": invalid}
+
+@app.get("/dictionary/export")
+async def export_dictionary(current_user: schemas.Principal = Depends(auth.get_current_active_user)):
+    """Streams the user's dictionary as plain text, one word per line."""
+    async def word_lines():
+        # The request-scoped session is closed before the body is streamed, so
+        # the export opens its own.
+        async with SessionLocal() as session:
+            async for word in crud.stream_dictionary_words(session, user_id=current_user.id):
+                yield word + "\n"
+
+    return StreamingResponse(
+        word_lines(),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="wordwise-dictionary.txt"'},
+    )
+
 # Inspiration Endpoints
 @app.post("/inspiration", response_model=schemas.Inspiration, status_code=status.HTTP_201_CREATED)
 async def create_inspiration(
     inspiration: schemas.InspirationCreate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
-    return await crud.create_inspiration(db=db, inspiration=inspiration, user_id=current_user.id)
+    db_inspiration, version = await crud.create_inspiration(db=db, inspiration=inspiration, user_id=current_user.id)
+    similarity_index.add(current_user.id, db_inspiration.id, db_inspiration.post_text, db_inspiration.tags, version)
+    return db_inspiration
 
 @app.get("/inspiration", response_model=List[schemas.Inspiration])
 async def get_inspirations(
-    skip: int = 0,
-    limit: int = 100,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    tags: Optional[List[str]] = Query(None),
+    platform: Optional[str] = None,
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
-    return await crud.get_inspirations(db=db, user_id=current_user.id, skip=skip, limit=limit)
+    """
+    Returns the user's inspirations newest first. Pass the X-Next-Cursor header
+    of a page as `cursor` to get the next one; the header is absent on the last
+    page. Repeat `tags` to require several tags.
+    """
+    inspirations = await crud.get_inspirations(
+        db=db, user_id=current_user.id, limit=limit, before_id=cursor, tags=tags, platform=platform
+    )
+    if len(inspirations) == limit:
+        response.headers["X-Next-Cursor"] = str(inspirations[-1].id)
+    return inspirations
+
+@app.get("/inspiration/search", response_model=List[schemas.InspirationSearchResult])
+async def search_inspirations(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(auth.get_db)
+):
+    """BM25-ranked full-text search over the user's saved post text and tags, with highlighted snippets."""
+    results = await crud.search_inspirations(db=db, user_id=current_user.id, query=q, limit=limit)
+    return [
+        {"inspiration": inspiration, "snippet": snippet, "score": score}
+        for inspiration, snippet, score in results
+    ]
 
 @app.delete("/inspiration/{inspiration_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_inspiration(
     inspiration_id: int,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
-    db_inspiration = await crud.delete_inspiration(db=db, inspiration_id=inspiration_id, user_id=current_user.id)
-    if db_inspiration is None:
+    deleted = await crud.delete_inspiration(db=db, inspiration_id=inspiration_id, user_id=current_user.id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Inspiration not found")
+    _, version = deleted
+    similarity_index.remove(current_user.id, inspiration_id, version)
     return
 
 class TagsUpdate(BaseModel):
@@ -132,36 +420,60 @@ class TagsUpdate(BaseModel):
 async def update_inspiration_tags(
     inspiration_id: int,
     tags_update: TagsUpdate,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
-    updated_inspiration = await crud.update_inspiration_tags(
+    updated = await crud.update_inspiration_tags(
         db=db,
         inspiration_id=inspiration_id,
         tags=tags_update.tags,
         user_id=current_user.id
     )
-    if updated_inspiration is None:
+    if updated is None:
         raise HTTPException(status_code=404, detail="Inspiration not found")
+    updated_inspiration, version = updated
+    similarity_index.add(current_user.id, updated_inspiration.id, updated_inspiration.post_text, updated_inspiration.tags, version)
     return updated_inspiration
 
+# Auto-selected inspirations must be at least this similar (cosine) to the draft.
+INSPIRATION_MIN_SIMILARITY = float(os.getenv("INSPIRATION_MIN_SIMILARITY", "0.1"))
+
+async def _select_inspirations(request: schemas.ToneAdjustRequest, user_id: int, db: AsyncSession):
+    """
+    Uses the client's explicit inspiration_ids if given (an empty list means
+    none); otherwise picks the user's saved inspirations most similar to the
+    draft from the local index.
+    """
+    if request.inspiration_ids is not None:
+        if not request.inspiration_ids:
+            return []
+        return await crud.get_inspirations_by_ids(db, inspiration_ids=request.inspiration_ids, user_id=user_id)
+    if not request.auto_inspirations or not request.inspiration_count:
+        return []
+
+    version = await crud.get_inspiration_version(db, user_id=user_id)
+    index = await similarity_index.get(user_id, lambda: crud.get_inspiration_texts(db, user_id=user_id), version)
+    ranked_ids = [
+        inspiration_id for inspiration_id, _ in
+        index.query(request.text, request.inspiration_count, min_score=INSPIRATION_MIN_SIMILARITY)
+    ]
+    by_id = {i.id: i for i in await crud.get_inspirations_by_ids(db, inspiration_ids=ranked_ids, user_id=user_id)}
+    return [by_id[i] for i in ranked_ids if i in by_id]
+
 @app.post("/tone-adjust", response_model=schemas.ToneAdjustResponse)
 async def adjust_tone(
     request: schemas.ToneAdjustRequest,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
-    inspirations = []
-    if request.inspiration_ids:
-        inspirations = await crud.get_inspirations_by_ids(
-            db, inspiration_ids=request.inspiration_ids, user_id=current_user.id
-        )
+    inspirations = await _select_inspirations(request, current_user.id, db)
 
     try:
         suggestions = await adjust_tone_with_ai(
             text=request.text,
             adjective=request.adjective,
-            inspirations=inspirations
+            inspirations=inspirations,
+            use_cache=not request.no_cache
         )
         return {"suggestions": suggestions}
     except ConnectionError as e:
@@ -170,17 +482,65 @@ async def adjust_tone(
         print(f"Unhandled error in adjust_tone: {e}")
         raise HTTPException(status_code=500, detail="Failed to get AI suggestions.")
 
+@app.post("/tone-adjust/stream")
+async def adjust_tone_stream(
+    request: schemas.ToneAdjustRequest,
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
+    db: AsyncSession = Depends(auth.get_db)
+):
+    """
+    Same as /tone-adjust, but streams the suggestions as newline-delimited JSON:
+    one {"suggestion": ...} line per rewrite as soon as the model finishes it,
+    then a final {"done": true} line. If the model fails partway through, the
+    last line is {"error": ...} instead, so a truncated stream is never
+    mistaken for a complete one.
+    """
+    inspirations = await _select_inspirations(request, current_user.id, db)
+
+    suggestions = adjust_tone_with_ai_stream(
+        text=request.text,
+        adjective=request.adjective,
+        inspirations=inspirations,
+        use_cache=not request.no_cache
+    )
+    # Start the stream here so that cached suggestions are served even without an
+    # OpenAI client, and so failures before the first line still get a status code.
+    try:
+        first = await suggestions.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Unhandled error in adjust_tone_stream: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get AI suggestions.")
+
+    async def suggestion_lines():
+        try:
+            if first is not None:
+                yield json.dumps({"suggestion": first}) + "\n"
+                async for suggestion in suggestions:
+                    yield json.dumps({"suggestion": suggestion}) + "\n"
+        except Exception as e:
+            print(f"Unhandled error in adjust_tone_stream: {e}")
+            yield json.dumps({"error": "Failed to get AI suggestions."}) + "\n"
+            return
+        yield json.dumps({"done": True}) + "\n"
+
+    return StreamingResponse(suggestion_lines(), media_type="application/x-ndjson")
+
 @app.post("/analyze-post", response_model=schemas.PostAnalysisResponse)
 async def analyze_post(
     request: schemas.PostAnalysisRequest,
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: schemas.Principal = Depends(auth.get_current_active_user)
 ):
     try:
         analysis_result = await analyze_post_with_ai(
             post_text=request.post_text,
             platform=request.platform,
             hashtags=request.hashtags,
-            mentions=request.mentions
+            mentions=request.mentions,
+            use_cache=not request.no_cache
         )
         return analysis_result
     except ConnectionError as e:
@@ -192,12 +552,13 @@ async def analyze_post(
 @app.post("/improve-post", response_model=schemas.ImprovePostResponse)
 async def improve_post(
     request: schemas.ImprovePostRequest,
-    current_user: models.User = Depends(auth.get_current_active_user),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user),
     db: AsyncSession = Depends(auth.get_db)
 ):
     try:
         improvement_result = await improve_post_with_ai(
-            post_text=request.post_text
+            post_text=request.post_text,
+            use_cache=not request.no_cache
         )
         return improvement_result
     except ConnectionError as e:
@@ -206,22 +567,47 @@ async def improve_post(
         print(f"Unhandled error in improve_post: {e}")
         raise HTTPException(status_code=500, detail="Failed to get improvement suggestions.")
 
+def _spooled_size(fileobj) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
 @app.post("/caption/generate", response_model=schemas.CaptionResponse)
 async def get_image_captions(
     image: UploadFile = File(...),
     platform: str = Form(...),
     keywords: Optional[str] = Form(None),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    no_cache: bool = Form(False),
+    current_user: schemas.Principal = Depends(auth.get_current_active_user)
 ):
     if not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
+    size = image.size
+    if size is None:
+        # No Content-Length for the part: measure the spooled upload instead.
+        size = await asyncio.to_thread(_spooled_size, image.file)
+    if size > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image exceeds the upload limit of {IMAGE_MAX_UPLOAD_BYTES} bytes.",
+        )
+
+    try:
+        # Decoded straight from the spooled upload; the original bytes are never
+        # held in memory or sent to the model.
+        prepared = await asyncio.to_thread(prepare_image, image.file, size)
+    except InvalidImage:
+        raise HTTPException(status_code=400, detail="Uploaded file is not a readable image.")
 
     try:
-        image_bytes = await image.read()
         captions = await generate_image_caption(
-            image_bytes=image_bytes,
+            image_bytes=prepared.data,
             platform=platform,
-            keywords=keywords
+            keywords=keywords,
+            mime_type=prepared.mime_type,
+            fingerprint=prepared.fingerprint,
+            use_cache=not no_cache,
         )
         return {"captions": captions}
     except ConnectionError as e:
@@ -0,0 +1,214 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+# Prometheus' default buckets, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# LLM calls take seconds rather than milliseconds.
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    def _samples(self) -> Iterable[str]:
+        return ()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the `with` block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge(_Metric):
+    """A value read from a callback at scrape time, e.g. a queue depth."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        super().__init__(name, help)
+        self.read = read
+
+    def _samples(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return
+        yield f"{self.name} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help, read))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "wordwise_stage_seconds",
+    "Time spent in one analysis stage (spacy_parse, languagetool_check, readability, passive_detection, emotion_inference).",
+    labels=("stage",),
+)
+ANALYZER_SECONDS = registry.histogram(
+    "wordwise_analyzer_seconds",
+    "Wall time of a whole analyzer (grammar, style, tone) for one text or batch.",
+    labels=("analyzer",),
+)
+ANALYZER_RESULTS = registry.counter(
+    "wordwise_analyzer_results_total",
+    "Analyzer outcomes by status (ok, timed_out, error).",
+    labels=("analyzer", "status"),
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "wordwise_db_query_seconds",
+    "Database statement execution time by statement type.",
+    labels=("statement",),
+)
+LLM_REQUEST_SECONDS = registry.histogram(
+    "wordwise_llm_request_seconds",
+    "OpenAI call latency per helper, including retries.",
+    labels=("helper", "outcome"),
+    buckets=LLM_BUCKETS,
+)
+LLM_RETRIES = registry.counter(
+    "wordwise_llm_retries_total",
+    "OpenAI calls retried after a rate limit, server or connection error.",
+    labels=("helper",),
+)
+LLM_TOKENS = registry.counter(
+    "wordwise_llm_tokens_total",
+    "Tokens reported by OpenAI responses.",
+    labels=("helper", "kind"),
+)
+LANGUAGETOOL_RESTARTS = registry.counter(
+    "wordwise_languagetool_restarts_total",
+    "LanguageTool instances replaced by the pool monitor, by reason (failed, hung, unavailable).",
+    labels=("reason",),
+)
+ANALYSIS_CACHE_LOOKUPS = registry.counter(
+    "wordwise_analysis_cache_lookups_total",
+    "Persistent analysis cache lookups by result (hit, miss).",
+    labels=("result",),
+)
+ANALYSES_CANCELLED = registry.counter(
+    "wordwise_analysis_cancelled_total",
+    "Analysis work abandoned because a newer request for the same field arrived, by stage (received, queued, or each analyzer whose result was abandoned).",
+    labels=("stage",),
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -10,6 +10,9 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped in the same transaction as every inspiration write, so workers can
+    # tell whether their copy of the user's similarity index is current.
+    inspirations_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     words = relationship("UserWord", back_populates="owner")
     inspirations = relationship("Inspiration", back_populates="owner")
@@ -23,6 +26,10 @@ class UserWord(Base):
 
     owner = relationship("User", back_populates="words")
 
+    __table_args__ = (
+        Index("ix_user_words_user_id_word", "user_id", "word", unique=True),
+    )
+
 class Inspiration(Base):
     __tablename__ = "inspirations"
 
@@ -34,4 +41,21 @@ class Inspiration(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
 
-    owner = relationship("User", back_populates="inspirations") 
\ No newline at end of file
+    owner = relationship("User", back_populates="inspirations")
+
+    __table_args__ = (
+        # Keyset pagination: WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_inspirations_user_id_id", "user_id", "id"),
+    )
+
+class InspirationTag(Base):
+    """Normalized tags of an inspiration; `Inspiration.tags` keeps the raw string."""
+    __tablename__ = "inspiration_tags"
+
+    inspiration_id = Column(Integer, ForeignKey("inspirations.id", ondelete="CASCADE"), primary_key=True)
+    tag = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_inspiration_tags_user_id_tag", "user_id", "tag", "inspiration_id"),
+    ) 
\ No newline at end of file
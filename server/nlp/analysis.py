@@ -1,14 +1,22 @@
-import spacy
-from typing import Optional, List
-import language_tool_python
-from transformers import pipeline
+from typing import AbstractSet, Optional, List
 import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 import os
 import re
-from openai import OpenAI
 from models import Inspiration
+import schemas
+from nlp.incremental import split_sentences, fingerprint, sentence_cache
+from nlp.batching import MicroBatcher
+from nlp.languagetool_pool import LanguageToolPool
+from nlp.offsets import Utf16OffsetMap
+from nlp import llm
+from nlp.llm_cache import llm_cache
+from nlp.analysis_cache import AnalysisCache, ANALYSIS_CACHE_ENABLED, ANALYSIS_CACHE_PATH, package_version
+from nlp.images import ImageFingerprint, caption_cache
+from metrics import STAGE_SECONDS, ANALYZER_SECONDS, ANALYZER_RESULTS, ANALYSES_CANCELLED
+from engine import AnalysisCancelled, AnalysisTicket
 from dotenv import load_dotenv
-import json
 import base64
 import math
 load_dotenv()
@@ -28,41 +36,218 @@ def convert_offsets_to_utf16(text: str, start: int, end: int):
     
     return start_utf16, end_utf16
 
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading language model for the first time. This may take a few minutes...")
-    from spacy.cli import download
-    download("en_core_web_sm")
-    nlp = spacy.load("en_core_web_sm")
-
-# Initialize LanguageTool
-try:
-    tool = language_tool_python.LanguageTool('en-US')
-except Exception as e:
-    print(f"Error initializing LanguageTool: {e}")
-    print("LanguageTool is required for grammar checking. Please ensure you have a working internet connection for the initial setup.")
-    tool = None
-
-# Initialize emotion analysis pipeline
-try:
-    emotion_classifier = pipeline(
-        "text-classification",
-        model="SamLowe/roberta-base-go_emotions",
-        top_k=None # Return all emotions
+# --- Lazily loaded models ---
+# Nothing heavy is imported or started at import time. Each model is loaded by its
+# getter on first use (or by warmup()), once per process; a failed load is
+# remembered as None so requests don't keep retrying it.
+
+# Passive-voice detection needs the dependency parser (which also gives sentence
+# boundaries); named entities and lemmas are never used.
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+SPACY_EXCLUDE = ["ner", "lemmatizer"]
+EMOTION_MODEL = os.getenv("EMOTION_MODEL", "SamLowe/roberta-base-go_emotions")
+# "pytorch" runs the transformers pipeline; "onnx" runs an int8-quantized ONNX export
+# of the same model, created in EMOTION_ONNX_DIR on first load (see nlp/emotion_onnx.py).
+EMOTION_BACKEND = os.getenv("EMOTION_BACKEND", "pytorch").lower()
+EMOTION_ONNX_DIR = os.getenv(
+    "EMOTION_ONNX_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "wordwise", EMOTION_MODEL.replace("/", "--") + "-onnx-int8"),
+)
+EMOTION_ONNX_THREADS = int(os.getenv("EMOTION_ONNX_THREADS", "0"))
+
+# Grammar checks are spread over a pool of LanguageTool instances, each running its
+# own local server, or one per URL in LANGUAGETOOL_SERVERS if that is set. A check
+# running longer than LANGUAGETOOL_CHECK_TIMEOUT seconds marks its instance as hung
+# and gets it restarted; idle instances are probed every LANGUAGETOOL_HEALTH_INTERVAL.
+LANGUAGETOOL_SERVERS = [url.strip() for url in os.getenv("LANGUAGETOOL_SERVERS", "").split(",") if url.strip()]
+LANGUAGETOOL_POOL_SIZE = int(os.getenv("LANGUAGETOOL_POOL_SIZE", str(len(LANGUAGETOOL_SERVERS) or min(4, os.cpu_count() or 1))))
+LANGUAGETOOL_CHECK_TIMEOUT = float(os.getenv("LANGUAGETOOL_CHECK_TIMEOUT", "10"))
+LANGUAGETOOL_HEALTH_INTERVAL = float(os.getenv("LANGUAGETOOL_HEALTH_INTERVAL", "30"))
+
+_UNLOADED = object()
+_model_lock = threading.RLock()
+_nlp = _UNLOADED
+_tool = _UNLOADED
+_emotion_classifier = _UNLOADED
+_warmed_up = False
+
+def _load_nlp():
+    try:
+        import spacy
+        try:
+            return spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+        except OSError:
+            print("Downloading language model for the first time. This may take a few minutes...")
+            from spacy.cli import download
+            download(SPACY_MODEL)
+            return spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    # spacy.cli.download exits (SystemExit) when the download fails.
+    except (Exception, SystemExit) as e:
+        print(f"Error initializing spaCy model '{SPACY_MODEL}': {e}")
+        return None
+
+def _load_tool():
+    try:
+        import language_tool_python
+    except Exception as e:
+        print(f"Error initializing LanguageTool: {e}")
+        return None
+
+    def create(index: int):
+        if LANGUAGETOOL_SERVERS:
+            return language_tool_python.LanguageTool('en-US', remote_server=LANGUAGETOOL_SERVERS[index % len(LANGUAGETOOL_SERVERS)])
+        return language_tool_python.LanguageTool('en-US')
+
+    pool = LanguageToolPool(
+        create,
+        size=LANGUAGETOOL_POOL_SIZE,
+        check_timeout=LANGUAGETOOL_CHECK_TIMEOUT,
+        health_interval=LANGUAGETOOL_HEALTH_INTERVAL,
     )
-except Exception as e:
-    print(f"Error initializing emotion classifier pipeline: {e}")
-    emotion_classifier = None
+    if not pool.start():
+        pool.close()
+        print("LanguageTool is required for grammar checking. Please ensure you have a working internet connection for the initial setup.")
+        return None
+    return pool
+
+def _load_emotion_classifier():
+    if EMOTION_BACKEND == "onnx":
+        try:
+            from nlp.emotion_onnx import load_emotion_classifier
+            return load_emotion_classifier(EMOTION_MODEL, EMOTION_ONNX_DIR, threads=EMOTION_ONNX_THREADS)
+        except Exception as e:
+            print(f"Error initializing ONNX emotion classifier: {e}")
+            return None
+    try:
+        from transformers import pipeline
+        return pipeline(
+            "text-classification",
+            model=EMOTION_MODEL,
+            top_k=None # Return all emotions
+        )
+    except Exception as e:
+        print(f"Error initializing emotion classifier pipeline: {e}")
+        return None
+
+def get_nlp():
+    global _nlp
+    if _nlp is _UNLOADED:
+        with _model_lock:
+            if _nlp is _UNLOADED:
+                _nlp = _load_nlp()
+    return _nlp
+
+def _require_nlp():
+    # Style analysis can't run without spaCy; raising reports it as "error".
+    nlp = get_nlp()
+    if nlp is None:
+        raise RuntimeError("The spaCy model is not available.")
+    return nlp
+
+def get_tool():
+    global _tool
+    if _tool is _UNLOADED:
+        with _model_lock:
+            if _tool is _UNLOADED:
+                _tool = _load_tool()
+    return _tool
 
-# OpenAI Client
-try:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    client = None
+def get_emotion_classifier():
+    global _emotion_classifier
+    if _emotion_classifier is _UNLOADED:
+        with _model_lock:
+            if _emotion_classifier is _UNLOADED:
+                _emotion_classifier = _load_emotion_classifier()
+    return _emotion_classifier
 
-tool_lock = threading.Lock()
+def get_openai_client():
+    return llm.get_client()
+
+def model_status() -> dict:
+    """Reports which models are loaded without triggering any loads."""
+    def status(model):
+        if model is _UNLOADED:
+            return "not_loaded"
+        return "loaded" if model is not None else "failed"
+    return {
+        "spacy": status(_nlp),
+        "language_tool": status(_tool),
+        "emotion_classifier": status(_emotion_classifier),
+        "openai_client": llm.client_status(),
+    }
+
+def language_tool_stats() -> Optional[dict]:
+    """The LanguageTool pool's stats, or None if it hasn't been started."""
+    tool = _tool
+    return tool.stats() if tool is not _UNLOADED and tool is not None else None
+
+def close_models():
+    """Stops the LanguageTool servers, if they were started."""
+    tool = _tool
+    if tool is not _UNLOADED and tool is not None:
+        tool.close()
+
+def is_ready() -> bool:
+    return _warmed_up
+
+def warmup() -> dict:
+    """
+    Loads every model and runs one tiny inference through each so the first real
+    request doesn't pay for lazy initialisation. Safe to call more than once.
+
+    A model that fails to load or to run is reported as "failed" in the returned
+    model_status() rather than raised, so the other models still warm up.
+    """
+    global _warmed_up
+    sample = "The post was written by the team. It looks great!"
+
+    def warm_nlp():
+        nlp = get_nlp()
+        if nlp:
+            nlp(sample)
+
+    def warm_tool():
+        tool = get_tool()
+        if tool:
+            tool.check(sample)
+
+    def warm_emotion_classifier():
+        if get_emotion_classifier():
+            emotion_batcher(sample)
+
+    failed = set()
+    for name, warm in (
+        ("spacy", warm_nlp),
+        ("language_tool", warm_tool),
+        ("emotion_classifier", warm_emotion_classifier),
+        ("openai_client", get_openai_client),
+    ):
+        try:
+            warm()
+        except Exception as e:
+            failed.add(name)
+            print(f"Error warming up {name}: {e}")
+    _warmed_up = True
+    status = model_status()
+    for name in failed:
+        status[name] = "failed"
+    return status
+
+# Concurrent tone requests are gathered for up to EMOTION_BATCH_MAX_WAIT_MS and run
+# through the classifier as one padded batch of at most EMOTION_BATCH_MAX_SIZE texts.
+EMOTION_BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "16"))
+EMOTION_BATCH_MAX_WAIT_MS = float(os.getenv("EMOTION_BATCH_MAX_WAIT_MS", "5"))
+
+def _classify_emotion_batch(texts: List[str]):
+    with STAGE_SECONDS.time(stage="emotion_inference"):
+        return get_emotion_classifier()(texts, batch_size=len(texts), truncation=True)
+
+emotion_batcher = MicroBatcher(
+    _classify_emotion_batch,
+    max_batch_size=EMOTION_BATCH_MAX_SIZE,
+    max_wait_ms=EMOTION_BATCH_MAX_WAIT_MS,
+    name="emotion-batcher"
+)
 
 def calculate_ari(text):
     """
@@ -101,108 +286,501 @@ def calculate_ari(text):
     # Return ceiling of the score as integer
     return math.ceil(max(0, ari_score))
 
-def analyze_text(text: str, platform: Optional[str], field: Optional[str], enabled_analyzers: Optional[dict], user_dictionary: Optional[List[str]] = None):
+def _readability_suggestion(text: str):
+    if len(text.split()) <= 5: # Only run on longer text
+        return None
+    try:
+        # Remove hashtags for more accurate readability scoring
+        with STAGE_SECONDS.time(stage="readability"):
+            text_for_readability = re.sub(r'#\w+', '', text)
+            grade = calculate_ari(text_for_readability)
+        if grade < 1:
+            grade = 1
+        readability_msg = f"This text has a readability score equivalent to a {int(grade)}{'st' if int(grade) % 10 == 1 and int(grade) % 100 != 11 else 'nd' if int(grade) % 10 == 2 and int(grade) % 100 != 12 else 'rd' if int(grade) % 10 == 3 and int(grade) % 100 != 13 else 'th'} grade reading level."
+        if grade > 12:
+            readability_msg += " Consider simplifying complex sentences for a broader audience."
+        elif grade < 6:
+            readability_msg += " This is very easy to read. Great for general audiences!"
+        else:
+            readability_msg += " This is easily understood by most readers."
+
+        return {
+            "type": "readability",
+            "message": readability_msg,
+            "score": grade
+        }
+    except Exception as e:
+        print(f"Error during readability analysis: {e}")
+        return None
+
+def _emotion_suggestion(text: str):
+    # Failures propagate so the tone analyzer is reported as "error" (and the
+    # result isn't cached) rather than as an "ok" with no emotions.
+    if len(text.split()) <= 3:
+        return None
+    if not get_emotion_classifier():
+        raise RuntimeError("The emotion classifier is not available.")
+    print("Checking tone...")
+    return _emotion_from_scores(emotion_batcher(text))
+
+def _emotion_from_scores(emotions):
+    # Filter emotions with a score > 0.25 and take the top 3
+    top_emotions = sorted(
+        [emo for emo in emotions if emo['score'] > 0.25],
+        key=lambda x: x['score'],
+        reverse=True
+    )[:3]
+
+    if top_emotions:
+        return {
+            "type": "emotion_analysis",
+            "emotions": top_emotions
+        }
+    return None
+
+PASSIVE_VOICE_MESSAGE = "This sentence appears to be in the passive voice. Consider rewriting it in the active voice for more direct and engaging writing."
+
+# Enabled analyzers run in parallel on this pool. Each one gets its own time budget
+# (in seconds) measured from the start of the analysis; an analyzer that misses it is
+# reported as "timed_out" and the response carries whatever the others produced.
+ANALYZER_THREADS = int(os.getenv("ANALYZER_THREADS", "12"))
+ANALYZER_TIMEOUTS = {
+    "grammar": float(os.getenv("ANALYZER_TIMEOUT_GRAMMAR", "2.5")),
+    "style": float(os.getenv("ANALYZER_TIMEOUT_STYLE", "1.5")),
+    "tone": float(os.getenv("ANALYZER_TIMEOUT_TONE", "1.5")),
+}
+ANALYZER_ORDER = ("grammar", "style", "tone")
+
+analyzer_executor = ThreadPoolExecutor(max_workers=ANALYZER_THREADS, thread_name_prefix="analyzer")
+
+# Finished analyses are cached on disk, shared by every worker process (see
+# nlp/analysis_cache.py). Bump ANALYZER_VERSION when a change here alters what the
+# analyzers return, so results cached by older code stop matching.
+ANALYZER_VERSION = 1
+
+def _model_versions() -> dict:
+    return {
+        "analyzers": ANALYZER_VERSION,
+        "spacy": [SPACY_MODEL, package_version("spacy"), package_version(SPACY_MODEL)],
+        "language_tool": [package_version("language_tool_python"), LANGUAGETOOL_SERVERS],
+        "emotion": [EMOTION_MODEL, EMOTION_BACKEND, package_version("transformers"), package_version("onnxruntime")],
+        "textstat": package_version("textstat"),
+    }
+
+def _make_analysis_cache():
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+    try:
+        return AnalysisCache(ANALYSIS_CACHE_PATH, _model_versions())
+    except Exception as e:
+        print(f"Error opening the analysis cache at {ANALYSIS_CACHE_PATH}: {e}")
+        return None
+
+analysis_cache = _make_analysis_cache()
+
+def _requested_analyzers(enabled_analyzers: dict) -> List[str]:
+    return [name for name in ANALYZER_ORDER if enabled_analyzers.get(name)]
+
+def _cacheable(result: dict, requested: List[str]) -> bool:
+    # Partial results (an analyzer timed out, failed or had no model) aren't cached.
+    statuses = result["analyzers"]
+    return all(name in statuses for name in requested) and all(status == "ok" for status in statuses.values())
+
+def _grammar_match_to_dict(match):
+    return {
+        "message": match.message,
+        "replacements": match.replacements,
+        "offset": match.offset,
+        "length": match.errorLength,
+        "category": match.category,
+        "ruleId": match.ruleId
+    }
+
+def _check_grammar(text: str):
+    with STAGE_SECONDS.time(stage="languagetool_check"):
+        return get_tool().check(text)
+
+def _parse(text: str):
+    with STAGE_SECONDS.time(stage="spacy_parse"):
+        return _require_nlp()(text)
+
+def _is_ignored(text: str, match: dict, ignored_words: AbstractSet[str]) -> bool:
+    return bool(ignored_words) and text[match["offset"]:match["offset"] + match["length"]] in ignored_words
+
+# Incremental grammar checks send all new or edited sentences to LanguageTool in
+# one request. Past this many, the whole text is checked instead, which also
+# catches rules that span sentences.
+GRAMMAR_INCREMENTAL_MAX_MISSES = int(os.getenv("GRAMMAR_INCREMENTAL_MAX_MISSES", "3"))
+_SENTENCE_SEPARATOR = "\n\n"
+
+def _matches_within(matches: List[dict], start: int, end: int) -> List[dict]:
+    """Matches that lie inside text[start:end], with offsets relative to `start`."""
+    return [
+        dict(m, offset=m["offset"] - start) for m in matches
+        if start <= m["offset"] and m["offset"] + m["length"] <= end
+    ]
+
+def _grammar_matches(text: str, incremental: bool, ignored_words: AbstractSet[str] = frozenset()):
     """
-    Analyzes text for grammar, tone, and SEO.
+    Returns grammar matches as dicts with character offsets into `text`, leaving
+    out any match whose flagged text is one of `ignored_words` (the user's
+    dictionary). LanguageTool's HTTP API has no per-request ignore list, and the
+    checkers are shared by concurrent requests, so the words are dropped here with
+    set lookups rather than by mutating the checker.
+
+    In incremental mode matches are cached per sentence by fingerprint, so only
+    new or edited sentences reach LanguageTool: up to
+    GRAMMAR_INCREMENTAL_MAX_MISSES of them are joined into a single check, and
+    more than that falls back to checking the whole text. Cached matches are
+    shifted to where their sentence sits in the current text.
     """
-    doc = nlp(text)
+    if not incremental:
+        print("Checking grammar...")
+        matches = (_grammar_match_to_dict(m) for m in _check_grammar(text))
+        return [m for m in matches if not _is_ignored(text, m, ignored_words)]
+
+    spans = split_sentences(text)
+    by_span = {}
+    missed = []
+    for start, end in spans:
+        cached = sentence_cache.get("grammar", fingerprint(text[start:end]))
+        if cached is None:
+            missed.append((start, end))
+        else:
+            by_span[(start, end)] = cached
+
+    if len(missed) > GRAMMAR_INCREMENTAL_MAX_MISSES:
+        print("Checking grammar...")
+        matches = [_grammar_match_to_dict(m) for m in _check_grammar(text)]
+        for start, end in missed:
+            sentence_cache.put("grammar", fingerprint(text[start:end]), _matches_within(matches, start, end))
+        return [m for m in matches if not _is_ignored(text, m, ignored_words)]
+
+    if missed:
+        sentences = [text[start:end] for start, end in missed]
+        found = [_grammar_match_to_dict(m) for m in _check_grammar(_SENTENCE_SEPARATOR.join(sentences))]
+        position = 0
+        for span, sentence in zip(missed, sentences):
+            by_span[span] = _matches_within(found, position, position + len(sentence))
+            sentence_cache.put("grammar", fingerprint(sentence), by_span[span])
+            position += len(sentence) + len(_SENTENCE_SEPARATOR)
+
+    matches = []
+    for start, end in spans:
+        shifted = (dict(m, offset=m["offset"] + start) for m in by_span[(start, end)])
+        matches.extend(m for m in shifted if not _is_ignored(text, m, ignored_words))
+    return matches
+
+def _grammar_suggestions(text: str, user_dictionary: Optional[AbstractSet[str]], incremental: bool, offsets: Utf16OffsetMap):
+    # Like tone, a missing LanguageTool is reported as "error" rather than dropped.
+    if not get_tool():
+        raise RuntimeError("LanguageTool is not available.")
     suggestions = []
-    text_lower = text.lower()
-    
+    for match in _grammar_matches(text, incremental, user_dictionary or frozenset()):
+        start = match["offset"]
+        end = start + match["length"]
+        start_utf16, end_utf16 = offsets.span(start, end)
+
+        suggestions.append({
+            "type": "grammar",
+            "message": match["message"],
+            "replacements": match["replacements"],
+            "start": start_utf16,
+            "end": end_utf16,
+            "category": match["category"],
+            "ruleId": match["ruleId"]
+        })
+    return suggestions
+
+def _passive_spans_in_doc(doc):
+    return [
+        (sent.start_char, sent.end_char)
+        for sent in doc.sents
+        if any(tok.dep_ == "nsubjpass" for tok in sent)
+    ]
+
+def _passive_spans(text: str, incremental: bool):
+    """
+    Returns (start, end) character spans of sentences in the passive voice.
+
+    In incremental mode sentences are split heuristically and only the ones
+    missing from the sentence cache are parsed, together, with nlp.pipe.
+    """
+    with STAGE_SECONDS.time(stage="passive_detection"):
+        if not incremental:
+            return _passive_spans_in_doc(_parse(text))
+        return _passive_spans_incremental(text)
+
+def _passive_spans_incremental(text: str):
+    spans = split_sentences(text)
+    passive = [None] * len(spans)
+    misses = []
+    for i, (start, end) in enumerate(spans):
+        key = fingerprint(text[start:end])
+        cached = sentence_cache.get("passive", key)
+        if cached is None:
+            misses.append((i, key))
+        else:
+            passive[i] = cached
+
+    if misses:
+        with STAGE_SECONDS.time(stage="spacy_parse"):
+            docs = list(_require_nlp().pipe([text[spans[i][0]:spans[i][1]] for i, _ in misses]))
+        for (i, key), sent_doc in zip(misses, docs):
+            is_passive = any(tok.dep_ == "nsubjpass" for tok in sent_doc)
+            sentence_cache.put("passive", key, is_passive)
+            passive[i] = is_passive
+
+    return [span for span, is_passive in zip(spans, passive) if is_passive]
+
+def _style_suggestions(text: str, incremental: bool, offsets: Utf16OffsetMap):
+    return _style_from_spans(text, _passive_spans(text, incremental), offsets)
+
+def _style_from_spans(text: str, passive_spans, offsets: Utf16OffsetMap):
+    suggestions = []
+
+    # 1. Readability Score
+    readability = _readability_suggestion(text)
+    if readability:
+        suggestions.append(readability)
+
+    # 2. Passive Voice Check
+    for start, end in passive_spans:
+        start_utf16, end_utf16 = offsets.span(start, end)
+        suggestions.append({
+            "type": "style",
+            "message": PASSIVE_VOICE_MESSAGE,
+            "replacements": [],
+            "start": start_utf16,
+            "end": end_utf16
+        })
+    return suggestions
+
+def _tone_suggestions(text: str):
+    emotion = _emotion_suggestion(text)
+    return [emotion] if emotion else []
+
+def _timed_analyzer(name: str, fn, *args):
+    with ANALYZER_SECONDS.time(analyzer=name):
+        return fn(*args)
+
+def analyze_text(text: str, platform: Optional[str], field: Optional[str], enabled_analyzers: Optional[dict], user_dictionary: Optional[AbstractSet[str]] = None, incremental: bool = False, ticket: Optional[AnalysisTicket] = None):
+    """
+    Analyzes text for grammar, tone, and SEO.
+
+    Grammar, style and tone run concurrently, each within its own deadline from
+    ANALYZER_TIMEOUTS. The result's "analyzers" map reports each enabled analyzer
+    as "ok", "timed_out" or "error"; suggestions from the ones that finished are
+    returned either way.
+
+    With `incremental=True`, grammar and passive-voice checks run per sentence and
+    results for sentences that have not changed since a previous request are served
+    from the sentence cache, with their offsets shifted to the new text.
+
+    Complete results are stored in the persistent analysis cache, and a text seen
+    before (by any worker) with the same analyzers and dictionary is answered from it.
+
+    If `ticket` is cancelled (a newer request for the same field arrived), the
+    analysis stops at the next stage boundary: analyzers that haven't started are
+    dropped and AnalysisCancelled is raised instead of returning a result.
+    """
+    if ticket is not None:
+        # Superseded while it waited for an engine thread.
+        ticket.check("queued")
     if enabled_analyzers is None:
         enabled_analyzers = {"grammar": True, "tone": True, "seo": True, "style": True}
 
-    # --- Grammar Analysis ---
-    if enabled_analyzers.get("grammar") and tool:
-        print("Checking grammar...")
-        matches = tool.check(text)
-        change = '''original_ignored_words = None
-        with tool_lock:
-            if user_dictionary:
-                original_ignored_words = tool.language.ignored_words.copy()
-                tool.language.ignored_words.update(user_dictionary)
-
-            matches = tool.check(text)
-
-            if user_dictionary and original_ignored_words is not None:
-                tool.language.ignored_words = original_ignored_words
-        '''
-        for match in matches:
-            if text[match.offset:match.offset + match.errorLength] in user_dictionary:
-                continue
-            
-            start_utf16, end_utf16 = convert_offsets_to_utf16(text, match.offset, match.offset + match.errorLength)
-
-            suggestions.append({
-                "type": "grammar",
-                "message": match.message,
-                "replacements": match.replacements,
-                "start": start_utf16,
-                "end": end_utf16,
-                "category": match.category,
-                "ruleId": match.ruleId
-            })
-
-    # --- Style & Readability Analysis ---
+    requested = _requested_analyzers(enabled_analyzers)
+    cache_key = None
+    if analysis_cache is not None and requested:
+        cache_key = analysis_cache.make_key(text, requested, user_dictionary, incremental)
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    # One UTF-16 offset map per analysis, shared by every analyzer that reports spans.
+    offsets = Utf16OffsetMap(text)
+
+    stages = {}
+    if enabled_analyzers.get("grammar"):
+        stages["grammar"] = (_grammar_suggestions, (text, user_dictionary, incremental, offsets))
     if enabled_analyzers.get("style"):
-        # 1. Readability Score
-        if len(text.split()) > 5: # Only run on longer text
-            try:
-                # Remove hashtags for more accurate readability scoring
-                text_for_readability = re.sub(r'#\w+', '', text)
-                grade = calculate_ari(text_for_readability)
-                if grade < 1:
-                    grade = 1
-                readability_msg = f"This text has a readability score equivalent to a {int(grade)}{'st' if int(grade) % 10 == 1 and int(grade) % 100 != 11 else 'nd' if int(grade) % 10 == 2 and int(grade) % 100 != 12 else 'rd' if int(grade) % 10 == 3 and int(grade) % 100 != 13 else 'th'} grade reading level."
-                if grade > 12:
-                    readability_msg += " Consider simplifying complex sentences for a broader audience."
-                elif grade < 6:
-                    readability_msg += " This is very easy to read. Great for general audiences!"
-                else:
-                    readability_msg += " This is easily understood by most readers."
-
-                suggestions.append({
-                    "type": "readability",
-                    "message": readability_msg,
-                    "score": grade
-                })
-            except Exception as e:
-                print(f"Error during readability analysis: {e}")
-
-        # 2. Passive Voice Check
-        for sent in doc.sents:
-            is_passive = any(tok.dep_ == "nsubjpass" for tok in sent)
-            if is_passive:
-                 start_utf16, end_utf16 = convert_offsets_to_utf16(text, sent.start_char, sent.end_char)
-                 suggestions.append({
-                    "type": "style",
-                    "message": "This sentence appears to be in the passive voice. Consider rewriting it in the active voice for more direct and engaging writing.",
-                    "replacements": [],
-                    "start": start_utf16,
-                    "end": end_utf16
-                })
-
-    # --- Advanced Tone Analysis (Model-based) ---
-    if enabled_analyzers.get("tone") and emotion_classifier and len(text.split()) > 3:
-        print("Checking tone...")
+        stages["style"] = (_style_suggestions, (text, incremental, offsets))
+    if enabled_analyzers.get("tone"):
+        stages["tone"] = (_tone_suggestions, (text,))
+
+    started = time.monotonic()
+    futures = {name: analyzer_executor.submit(_timed_analyzer, name, fn, *args) for name, (fn, args) in stages.items()}
+
+    suggestions = []
+    statuses = {}
+    for index, name in enumerate(ANALYZER_ORDER):
+        future = futures.get(name)
+        if future is None:
+            continue
+        remaining = started + ANALYZER_TIMEOUTS[name] - time.monotonic()
+        wait([future] if ticket is None else [future, ticket.waiter], timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+        if ticket is not None and ticket.cancelled:
+            # Analyzers still waiting for a thread are skipped; ones already running
+            # can't be interrupted and finish unused. Both count as abandoned.
+            for abandoned in ANALYZER_ORDER[index:]:
+                if abandoned in futures:
+                    futures[abandoned].cancel()
+                    ANALYSES_CANCELLED.inc(stage=abandoned)
+            raise AnalysisCancelled(name)
         try:
-            model_results = emotion_classifier(text)
-            # Filter emotions with a score > 0.25 and take the top 3
-            top_emotions = sorted(
-                [emo for emo in model_results[0] if emo['score'] > 0.25],
-                key=lambda x: x['score'],
-                reverse=True
-            )[:3]
-
-            if top_emotions:
-                suggestions.append({
-                    "type": "emotion_analysis",
-                    "emotions": top_emotions
-                })
+            suggestions.extend(future.result(timeout=0))
+            statuses[name] = "ok"
+        except FutureTimeoutError:
+            # The worker thread can't be interrupted; drop its result if it arrives late.
+            future.cancel()
+            statuses[name] = "timed_out"
+            print(f"Analyzer '{name}' missed its {ANALYZER_TIMEOUTS[name]}s deadline.")
         except Exception as e:
-            print(f"Error during emotion analysis: {e}")
+            statuses[name] = "error"
+            print(f"Error during {name} analysis: {e}")
+
+    for name, status in statuses.items():
+        ANALYZER_RESULTS.inc(analyzer=name, status=status)
+    result = {"suggestions": suggestions, "analyzers": statuses}
+    if cache_key is not None and _cacheable(result, requested):
+        analysis_cache.set(cache_key, result)
+    return result
+
+# A batch is given this long (in seconds) per analyzer, from the start of the batch.
+ANALYZE_BATCH_TIMEOUT = float(os.getenv("ANALYZE_BATCH_TIMEOUT", "30"))
+NLP_PIPE_BATCH_SIZE = int(os.getenv("NLP_PIPE_BATCH_SIZE", "32"))
+# Batch grammar checks run on their own small pool, shared by every batch, so one
+# large batch can't take all of analyzer_executor's threads from /analyze/.
+ANALYZE_BATCH_GRAMMAR_THREADS = int(os.getenv("ANALYZE_BATCH_GRAMMAR_THREADS", str(max(1, ANALYZER_THREADS // 4))))
+
+batch_grammar_executor = ThreadPoolExecutor(max_workers=ANALYZE_BATCH_GRAMMAR_THREADS, thread_name_prefix="batch-grammar")
+
+def _style_suggestions_batch(texts: List[str], offsets: List[Utf16OffsetMap]):
+    with STAGE_SECONDS.time(stage="spacy_parse"):
+        docs = list(_require_nlp().pipe(texts, batch_size=NLP_PIPE_BATCH_SIZE))
+    return [
+        _style_from_spans(text, _passive_spans_in_doc(doc), text_offsets)
+        for text, doc, text_offsets in zip(texts, docs, offsets)
+    ]
+
+def analyze_texts(items: List[tuple], user_dictionary: Optional[AbstractSet[str]] = None):
+    """
+    Analyzes a batch of (text, enabled_analyzers) items and returns one
+    analyze_text-style result per item, in order.
+
+    Items found in the persistent analysis cache are answered from it. For the
+    rest, instead of one pass per text, spaCy parses every style text in one
+    nlp.pipe call, tone texts go to the emotion classifier together (in batches
+    of EMOTION_BATCH_MAX_SIZE) and grammar checks run concurrently on
+    ANALYZE_BATCH_GRAMMAR_THREADS threads. Each analyzer has ANALYZE_BATCH_TIMEOUT
+    seconds for the whole batch.
+    """
+    default_analyzers = {"grammar": True, "tone": True, "seo": True, "style": True}
+    items = [(text, enabled if enabled is not None else default_analyzers) for text, enabled in items]
+    results = [None] * len(items)
+    keys = [None] * len(items)
+    if analysis_cache is not None:
+        for i, (text, enabled) in enumerate(items):
+            requested = _requested_analyzers(enabled)
+            if requested:
+                keys[i] = analysis_cache.make_key(text, requested, user_dictionary, False)
+                results[i] = analysis_cache.get(keys[i])
+
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        for i, result in zip(misses, _analyze_texts([items[i] for i in misses], user_dictionary)):
+            results[i] = result
+            if keys[i] is not None and _cacheable(result, _requested_analyzers(items[i][1])):
+                analysis_cache.set(keys[i], result)
+    return results
+
+def _analyze_texts(items: List[tuple], user_dictionary: Optional[AbstractSet[str]]):
+    offsets = [Utf16OffsetMap(text) for text, _ in items]
+    results = [{"suggestions": {}, "analyzers": {}} for _ in items]
+    started = time.monotonic()
 
-    return {"suggestions": suggestions}
+    grammar_futures = {}
+    grammar_items = [i for i, (_, enabled) in enumerate(items) if enabled.get("grammar")]
+    if grammar_items and get_tool():
+        for i in grammar_items:
+            grammar_futures[i] = batch_grammar_executor.submit(
+                _timed_analyzer, "grammar", _grammar_suggestions, items[i][0], user_dictionary, False, offsets[i]
+            )
+
+    style_items = [i for i, (_, enabled) in enumerate(items) if enabled.get("style")]
+    style_future = None
+    if style_items:
+        style_future = analyzer_executor.submit(
+            _timed_analyzer, "style", _style_suggestions_batch,
+            [items[i][0] for i in style_items], [offsets[i] for i in style_items]
+        )
+
+    tone_futures = {}
+    tone_items = [i for i, (_, enabled) in enumerate(items) if enabled.get("tone")]
+    # Same rules as _emotion_suggestion: short texts get no tone suggestion, and
+    # a missing classifier is an error rather than an empty result.
+    long_tone_items = [i for i in tone_items if len(items[i][0].split()) > 3]
+    tone_classifier = get_emotion_classifier() if long_tone_items else None
+    if tone_classifier:
+        print(f"Checking tone for {len(long_tone_items)} texts...")
+        for i in long_tone_items:
+            tone_futures[i] = emotion_batcher.submit(items[i][0])
+
+    def collect(name, i, future, to_suggestions):
+        remaining = started + ANALYZE_BATCH_TIMEOUT - time.monotonic()
+        try:
+            results[i]["suggestions"][name] = to_suggestions(future.result(timeout=max(0.0, remaining)))
+            results[i]["analyzers"][name] = "ok"
+        except FutureTimeoutError:
+            future.cancel()
+            results[i]["analyzers"][name] = "timed_out"
+        except Exception as e:
+            results[i]["analyzers"][name] = "error"
+            print(f"Error during batch {name} analysis: {e}")
+
+    for i in grammar_items:
+        if i in grammar_futures:
+            collect("grammar", i, grammar_futures[i], lambda suggestions: suggestions)
+        else:
+            # LanguageTool is unavailable.
+            results[i]["analyzers"]["grammar"] = "error"
+
+    if style_future is not None:
+        remaining = started + ANALYZE_BATCH_TIMEOUT - time.monotonic()
+        try:
+            for i, suggestions in zip(style_items, style_future.result(timeout=max(0.0, remaining))):
+                results[i]["suggestions"]["style"] = suggestions
+                results[i]["analyzers"]["style"] = "ok"
+        except Exception as e:
+            style_future.cancel()
+            status = "timed_out" if isinstance(e, FutureTimeoutError) else "error"
+            if status == "error":
+                print(f"Error during batch style analysis: {e}")
+            for i in style_items:
+                results[i]["analyzers"]["style"] = status
+
+    for i in tone_items:
+        if i in tone_futures:
+            collect("tone", i, tone_futures[i], lambda emotions: [s for s in [_emotion_from_scores(emotions)] if s])
+        elif i in long_tone_items:
+            results[i]["analyzers"]["tone"] = "error"
+        else:
+            results[i]["suggestions"]["tone"] = []
+            results[i]["analyzers"]["tone"] = "ok"
+
+    for result in results:
+        for name, status in result["analyzers"].items():
+            ANALYZER_RESULTS.inc(analyzer=name, status=status)
+
+    # Same suggestion order and status keys as analyze_text.
+    return [
+        {
+            "suggestions": [s for name in ANALYZER_ORDER for s in result["suggestions"].get(name, [])],
+            "analyzers": {name: result["analyzers"][name] for name in ANALYZER_ORDER if name in result["analyzers"]},
+        }
+        for result in results
+    ]
 
 def _clean_ai_suggestion(suggestion: str) -> str:
     """Removes leading numbering/bullets and surrounding quotes from a string."""
@@ -216,10 +794,7 @@ def _clean_ai_suggestion(suggestion: str) -> str:
         cleaned = cleaned[1:-1]
     return cleaned
 
-async def adjust_tone_with_ai(text: str, adjective: str, inspirations: Optional[List[Inspiration]] = None):
-    if not client:
-        raise ConnectionError("OpenAI client is not initialized.")
-
+def _tone_adjust_messages(text: str, adjective: str, inspirations: Optional[List[Inspiration]] = None):
     system_prompt = f"You are an expert writing assistant. A user wants to rewrite their text to make it more '{adjective}'. Your task is to provide 3-4 high-quality, distinct suggestions that match this new tone while preserving the original message's core meaning. Do not explain the suggestions, just provide the rewritten text. Each suggestion should be on a new line."
 
     if inspirations:
@@ -228,13 +803,31 @@ async def adjust_tone_with_ai(text: str, adjective: str, inspirations: Optional[
             inspiration_text += f"- \"{insp.post_text}\"\n"
         system_prompt += inspiration_text
 
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Here is the text to rewrite:\n\n\"{text}\""}
+    ]
+
+def _tone_adjust_cache_key(text: str, adjective: str, inspirations: Optional[List[Inspiration]] = None):
+    return llm_cache.make_key(
+        "tone-adjust", text, adjective=adjective,
+        inspiration_ids=[insp.id for insp in inspirations or []]
+    )
+
+async def adjust_tone_with_ai(text: str, adjective: str, inspirations: Optional[List[Inspiration]] = None, use_cache: bool = True):
+    cache_key = _tone_adjust_cache_key(text, adjective, inspirations)
+    cached = await llm_cache.get("tone-adjust", cache_key, bypass=not use_cache)
+    if cached is not None:
+        return cached
+
+    if not get_openai_client():
+        raise ConnectionError("OpenAI client is not initialized.")
+
     try:
-        response = client.chat.completions.create(
+        response = await llm.chat_completion(
+            helper="tone_adjust",
             model="gpt-4.1-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Here is the text to rewrite:\n\n\"{text}\""}
-            ],
+            messages=_tone_adjust_messages(text, adjective, inspirations),
             temperature=0.7,
             max_tokens=500,
             n=1,
@@ -242,13 +835,61 @@ async def adjust_tone_with_ai(text: str, adjective: str, inspirations: Optional[
         content = response.choices[0].message.content
         # Split suggestions by newline and filter out any empty strings
         suggestions = [s.strip() for s in content.split('\n') if s.strip()]
-        return [_clean_ai_suggestion(s) for s in suggestions if s]
+        suggestions = [_clean_ai_suggestion(s) for s in suggestions if s]
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
         return []
+    if suggestions:
+        await llm_cache.set(cache_key, suggestions)
+    return suggestions
 
-async def analyze_post_with_ai(post_text: str, platform: str, hashtags: List[str], mentions: List[str]):
-    if not client:
+async def adjust_tone_with_ai_stream(text: str, adjective: str, inspirations: Optional[List[Inspiration]] = None, use_cache: bool = True):
+    """
+    Streaming variant of adjust_tone_with_ai: yields each cleaned suggestion as
+    soon as the model finishes its line. Errors, including ones partway through
+    the stream, are raised to the caller; only complete streams are cached.
+    """
+    cache_key = _tone_adjust_cache_key(text, adjective, inspirations)
+    cached = await llm_cache.get("tone-adjust", cache_key, bypass=not use_cache)
+    if cached is not None:
+        for suggestion in cached:
+            yield suggestion
+        return
+
+    if not get_openai_client():
+        raise ConnectionError("OpenAI client is not initialized.")
+
+    suggestions = []
+    buffer = ""
+    async for delta in llm.stream_chat_completion(
+        helper="tone_adjust_stream",
+        model="gpt-4.1-mini",
+        messages=_tone_adjust_messages(text, adjective, inspirations),
+        temperature=0.7,
+        max_tokens=500,
+        n=1,
+    ):
+        buffer += delta
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            suggestion = _clean_ai_suggestion(line.strip()) if line.strip() else ""
+            if suggestion:
+                suggestions.append(suggestion)
+                yield suggestion
+    suggestion = _clean_ai_suggestion(buffer.strip()) if buffer.strip() else ""
+    if suggestion:
+        suggestions.append(suggestion)
+        yield suggestion
+    if suggestions:
+        await llm_cache.set(cache_key, suggestions)
+
+async def analyze_post_with_ai(post_text: str, platform: str, hashtags: List[str], mentions: List[str], use_cache: bool = True):
+    cache_key = llm_cache.make_key("analyze-post", post_text, platform=platform, hashtags=hashtags, mentions=mentions)
+    cached = await llm_cache.get("analyze-post", cache_key, bypass=not use_cache)
+    if cached is not None:
+        return cached
+
+    if not get_openai_client():
         raise ConnectionError("OpenAI client is not initialized.")
 
     system_prompt = f"""
@@ -277,7 +918,8 @@ async def analyze_post_with_ai(post_text: str, platform: str, hashtags: List[str
     """
 
     try:
-        response = client.chat.completions.create(
+        response = await llm.chat_completion(
+            helper="analyze_post",
             model="gpt-4.1-mini",
             response_format={"type": "json_object"},
             messages=[
@@ -287,8 +929,11 @@ async def analyze_post_with_ai(post_text: str, platform: str, hashtags: List[str
             temperature=0.5,
         )
         analysis_data = response.choices[0].message.content
-        # The response should be a JSON string, so we parse it.
-        return json.loads(analysis_data)
+        # The response should be a JSON string, so we parse it. A reply with the
+        # wrong shape raises here, so it is never cached.
+        analysis = schemas.PostAnalysisResponse.model_validate_json(analysis_data).model_dump()
+        await llm_cache.set(cache_key, analysis)
+        return analysis
     except Exception as e:
         print(f"Error calling OpenAI API for post analysis: {e}")
         return {
@@ -297,8 +942,13 @@ async def analyze_post_with_ai(post_text: str, platform: str, hashtags: List[str
             "recommendations": []
         }
 
-async def improve_post_with_ai(post_text: str):
-    if not client:
+async def improve_post_with_ai(post_text: str, use_cache: bool = True):
+    cache_key = llm_cache.make_key("improve-post", post_text)
+    cached = await llm_cache.get("improve-post", cache_key, bypass=not use_cache)
+    if cached is not None:
+        return cached
+
+    if not get_openai_client():
         raise ConnectionError("OpenAI client is not initialized.")
 
     system_prompt = """
@@ -317,7 +967,8 @@ async def improve_post_with_ai(post_text: str):
     user_message = f"Here is the post to improve:\n\n---\n{post_text}\n---"
 
     try:
-        response = client.chat.completions.create(
+        response = await llm.chat_completion(
+            helper="improve_post",
             model="gpt-4.1-mini",
             response_format={"type": "json_object"},
             messages=[
@@ -327,7 +978,9 @@ async def improve_post_with_ai(post_text: str):
             temperature=0.6,
         )
         improvement_data = response.choices[0].message.content
-        return json.loads(improvement_data)
+        improvement = schemas.ImprovePostResponse.model_validate_json(improvement_data).model_dump()
+        await llm_cache.set(cache_key, improvement)
+        return improvement
     except Exception as e:
         print(f"Error calling OpenAI API for post improvement: {e}")
         return {
@@ -336,8 +989,20 @@ async def improve_post_with_ai(post_text: str):
             "structure_suggestions": ["Could not get suggestions due to an error."]
         }
 
-async def generate_image_caption(image_bytes: bytes, platform: str, keywords: Optional[str] = None):
-    if not client:
+async def generate_image_caption(image_bytes: bytes, platform: str, keywords: Optional[str] = None,
+                                 mime_type: str = "image/jpeg", fingerprint: Optional[ImageFingerprint] = None,
+                                 use_cache: bool = True):
+    """
+    Captions an image. With a `fingerprint` from nlp.images, near-identical
+    images captioned before for the same platform and keywords are answered
+    from caption_cache.
+    """
+    if fingerprint is not None:
+        cached = caption_cache.get(platform, keywords, fingerprint, bypass=not use_cache)
+        if cached is not None:
+            return cached
+
+    if not get_openai_client():
         raise ConnectionError("OpenAI client is not initialized.")
 
     base64_image = base64.b64encode(image_bytes).decode('utf-8')
@@ -357,7 +1022,8 @@ async def generate_image_caption(image_bytes: bytes, platform: str, keywords: Op
         user_prompt += f"\nUse these keywords as inspiration: '{keywords}'"
 
     try:
-        response = client.chat.completions.create(
+        response = await llm.chat_completion(
+            helper="image_caption",
             model="gpt-4.1-mini",
             response_format={"type": "json_object"},
             messages=[
@@ -369,7 +1035,7 @@ async def generate_image_caption(image_bytes: bytes, platform: str, keywords: Op
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
+                                "url": f"data:{mime_type};base64,{base64_image}"
                             }
                         }
                     ]
@@ -378,9 +1044,11 @@ async def generate_image_caption(image_bytes: bytes, platform: str, keywords: Op
             temperature=0.7,
             max_tokens=400
         )
-        caption_data = json.loads(response.choices[0].message.content)
-        captions = caption_data.get("captions", [])
-        return [_clean_ai_suggestion(c) for c in captions if c]
+        captions = schemas.CaptionResponse.model_validate_json(response.choices[0].message.content).captions
+        captions = [_clean_ai_suggestion(c) for c in captions if c]
+        if captions and fingerprint is not None:
+            caption_cache.set(platform, keywords, fingerprint, captions)
+        return captions
     except Exception as e:
         print(f"Error calling OpenAI API for image captioning: {e}")
         return [] 
\ No newline at end of file
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from importlib import metadata
+from typing import AbstractSet, List, Optional
+
+from metrics import ANALYSIS_CACHE_LOOKUPS
+
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "./analysis_cache.db")
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Eviction runs after every this many writes from a process rather than after each one.
+ANALYSIS_CACHE_EVICT_EVERY = int(os.getenv("ANALYSIS_CACHE_EVICT_EVERY", "64"))
+# A hit only rewrites last_access if it is older than this, so hot entries don't
+# turn every read into a write.
+ANALYSIS_CACHE_TOUCH_AFTER = float(os.getenv("ANALYSIS_CACHE_TOUCH_AFTER", "60"))
+
+
+def package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+def _hash_words(words: AbstractSet[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(words)).encode("utf-8")).hexdigest()[:16]
+
+
+class DictionaryWords(frozenset):
+    """
+    A user's dictionary words as loaded (and cached) by crud. The content hash is
+    computed on first use and kept with the set, so it costs one sort and hash per
+    dictionary change rather than one per analysis.
+    """
+
+    _version = None
+
+    @property
+    def version(self) -> str:
+        if self._version is None:
+            self._version = _hash_words(self) if self else ""
+        return self._version
+
+
+def dictionary_version(words: Optional[AbstractSet[str]]) -> str:
+    """A content hash of a user dictionary; users with the same words share entries."""
+    if not words:
+        return ""
+    if isinstance(words, DictionaryWords):
+        return words.version
+    return _hash_words(words)
+
+
+class AnalysisCache:
+    """
+    Content-addressed store of analyze_text results in an SQLite file.
+
+    Entries are keyed by a hash of the text, the enabled analyzers, the user
+    dictionary's contents and the versions of the models and analyzer code that
+    produced them, so they never need invalidating: a changed input or model just
+    stops matching. Every worker process opens the same file (WAL mode lets them
+    read concurrently), and entries survive restarts. When the stored results
+    grow past `max_bytes`, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, model_versions: dict, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.model_versions = json.dumps(model_versions, sort_keys=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_cache_last_access ON analysis_cache (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread: analyses run on many threads at once, and
+        # separate connections let their reads proceed in parallel.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    def make_key(self, text: str, analyzers: List[str], user_dictionary: Optional[AbstractSet[str]], incremental: bool) -> str:
+        parts = {
+            "text": text,
+            "analyzers": sorted(analyzers),
+            "incremental": bool(incremental),
+            # The dictionary only filters grammar matches.
+            "dictionary": dictionary_version(user_dictionary) if "grammar" in analyzers else "",
+            "models": self.model_versions,
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT value, last_access FROM analysis_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > ANALYSIS_CACHE_TOUCH_AFTER:
+                with conn:
+                    conn.execute("UPDATE analysis_cache SET last_access = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"Error reading the analysis cache: {e}")
+            return None
+        self._count("hits" if row is not None else "misses")
+        ANALYSIS_CACHE_LOOKUPS.inc(result="hit" if row is not None else "miss")
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: str, value):
+        data = json.dumps(value, separators=(",", ":"))
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time()),
+                )
+        except sqlite3.Error as e:
+            print(f"Error writing to the analysis cache: {e}")
+            return
+        self._count("stores")
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % ANALYSIS_CACHE_EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drops least recently used entries until the stored results fit in max_bytes."""
+        try:
+            conn = self._connect()
+            with conn:
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+                if total <= self.max_bytes:
+                    return 0
+                # Walk entries from most to least recently used; everything past the
+                # point where the running total exceeds max_bytes goes.
+                rows = conn.execute("SELECT key, size FROM analysis_cache ORDER BY last_access DESC").fetchall()
+                kept = 0
+                doomed = []
+                for key, size in rows:
+                    kept += size
+                    if kept > self.max_bytes:
+                        doomed.append((key,))
+                conn.executemany("DELETE FROM analysis_cache WHERE key = ?", doomed)
+        except sqlite3.Error as e:
+            print(f"Error evicting from the analysis cache: {e}")
+            return 0
+        self._count("evicted", len(doomed))
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        try:
+            entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        return dict(
+            counters,
+            hit_rate=(counters["hits"] / lookups) if lookups else 0.0,
+            entries=entries,
+            bytes=size,
+            max_bytes=self.max_bytes,
+        )
@@ -0,0 +1,138 @@
+"""
+ONNX Runtime backend for the emotion classifier.
+
+The Hugging Face model is exported to ONNX once, with int8 dynamic quantization
+of its weights, into a local cache directory; later loads only read that
+directory. To export ahead of time (e.g. while building an image), run from the
+server directory:
+
+    python -m nlp.emotion_onnx [--model SamLowe/roberta-base-go_emotions] [--output DIR]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from typing import List, Union
+
+import numpy as np
+
+MODEL_FILE = "model_int8.onnx"
+
+
+def export_emotion_onnx(model_name: str, output_dir: str) -> str:
+    """
+    Exports `model_name` to ONNX, quantizes it to int8 and saves it with its
+    tokenizer and config in `output_dir`. Returns `output_dir`.
+
+    The export is written to a temporary directory next to `output_dir` and
+    renamed into place, so a process that loads concurrently sees either no
+    export or a complete one.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".emotion-onnx-", dir=parent)
+    try:
+        fp32_path = os.path.join(staging, "model_fp32.onnx")
+        sample = tokenizer(["Exporting the emotion model."], return_tensors="pt")
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"},
+                },
+                opset_version=17,
+                dynamo=False,
+            )
+        quantize_dynamic(fp32_path, os.path.join(staging, MODEL_FILE), weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+        tokenizer.save_pretrained(staging)
+        model.config.save_pretrained(staging)
+        try:
+            os.rename(staging, output_dir)
+        except OSError:
+            # Another process finished its export first; keep that one.
+            if not os.path.exists(os.path.join(output_dir, MODEL_FILE)):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return output_dir
+
+
+class OnnxEmotionClassifier:
+    """
+    Drop-in for the transformers text-classification pipeline with top_k=None:
+    returns one list of {"label", "score"} dicts per text, sorted by score.
+    """
+
+    def __init__(self, model_dir: str, threads: int = 0):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        config = AutoConfig.from_pretrained(model_dir)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+        # Same rule as the pipeline: independent sigmoids for multi-label models.
+        self.multi_label = config.problem_type == "multi_label_classification" or len(self.labels) == 1
+        self.max_length = min(self.tokenizer.model_max_length, getattr(config, "max_position_embeddings", 514) - 2)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _scores(self, logits: np.ndarray) -> np.ndarray:
+        if self.multi_label:
+            return 1.0 / (1.0 + np.exp(-logits))
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = 16, truncation: bool = True):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        batch_size = max(1, batch_size)
+        results = []
+        for i in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[i:i + batch_size], padding=True, truncation=truncation,
+                max_length=self.max_length, return_tensors="np",
+            )
+            feed = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            scores = self._scores(self.session.run(None, feed)[0])
+            for row in scores:
+                order = np.argsort(-row)
+                results.append([{"label": self.labels[j], "score": float(row[j])} for j in order])
+        return results
+
+
+def load_emotion_classifier(model_name: str, model_dir: str, threads: int = 0) -> OnnxEmotionClassifier:
+    """Loads the quantized model from `model_dir`, exporting it there first if it isn't cached yet."""
+    if not os.path.exists(os.path.join(model_dir, MODEL_FILE)):
+        print(f"Exporting {model_name} to ONNX for the first time. This may take a few minutes...")
+        export_emotion_onnx(model_name, model_dir)
+    return OnnxEmotionClassifier(model_dir, threads=threads)
+
+
+if __name__ == "__main__":
+    from nlp.analysis import EMOTION_MODEL, EMOTION_ONNX_DIR
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=EMOTION_MODEL)
+    parser.add_argument("--output", default=EMOTION_ONNX_DIR)
+    args = parser.parse_args()
+    print(export_emotion_onnx(args.model, args.output))
@@ -0,0 +1,214 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# Uploads are spooled by the multipart parser (in memory up to 1 MB, then to a
+# temporary file) and read from there; anything past this is rejected.
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+# The vision model fits images into 2048x2048 and then scales the shortest side
+# down to 768, so larger images only cost upload time and tokens.
+IMAGE_MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_LONG_SIDE", "2048"))
+IMAGE_MAX_SHORT_SIDE = int(os.getenv("IMAGE_MAX_SHORT_SIDE", "768"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Images are rejected from their header, before decoding, past this many pixels.
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+CAPTION_CACHE_MAX_ENTRIES = int(os.getenv("CAPTION_CACHE_MAX_ENTRIES", "2000"))
+CAPTION_CACHE_TTL = float(os.getenv("CAPTION_CACHE_TTL", str(24 * 60 * 60)))
+# Images whose 128-bit difference hashes differ in at most this many bits (and
+# whose colour and shape agree) are treated as the same picture: recompressed,
+# resized or lightly edited.
+CAPTION_CACHE_MAX_DISTANCE = int(os.getenv("CAPTION_CACHE_MAX_DISTANCE", "10"))
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class ImageFingerprint(NamedTuple):
+    """
+    Perceptual fingerprint for near-duplicate detection: horizontal and vertical
+    difference hashes (128 bits) plus the mean colour and aspect ratio, which the
+    hashes alone don't see (a flat red square and a flat blue one hash the same).
+    """
+    dhash: int
+    mean_rgb: Tuple[int, int, int]
+    aspect: float
+
+    def matches(self, other: "ImageFingerprint", max_distance: int) -> Optional[int]:
+        """Returns the hash distance to `other` if it counts as the same image, else None."""
+        if abs(self.aspect - other.aspect) > 0.05 * max(self.aspect, other.aspect):
+            return None
+        if max(abs(a - b) for a, b in zip(self.mean_rgb, other.mean_rgb)) > 16:
+            return None
+        distance = bin(self.dhash ^ other.dhash).count("1")
+        return distance if distance <= max_distance else None
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    fingerprint: ImageFingerprint
+    original_size: Optional[int]
+
+
+def _target_scale(width: int, height: int) -> float:
+    long_side, short_side = max(width, height), min(width, height)
+    return min(1.0, IMAGE_MAX_LONG_SIDE / long_side, IMAGE_MAX_SHORT_SIDE / short_side)
+
+
+def _dhash_bits(pixels: List[int], width: int, rows: int, cols: int, step: int) -> int:
+    value = 0
+    for row in range(rows):
+        for col in range(cols):
+            i = row * width + col
+            value = (value << 1) | (pixels[i] > pixels[i + step])
+    return value
+
+
+def fingerprint_image(image: Image.Image) -> ImageFingerprint:
+    gray = image.convert("L")
+    horizontal = _dhash_bits(list(gray.resize((9, 8), Image.Resampling.BILINEAR).getdata()), 9, 8, 8, 1)
+    vertical = _dhash_bits(list(gray.resize((8, 9), Image.Resampling.BILINEAR).getdata()), 8, 8, 8, 8)
+    mean_rgb = tuple(image.convert("RGB").resize((1, 1), Image.Resampling.BOX).getpixel((0, 0)))
+    return ImageFingerprint((horizontal << 64) | vertical, mean_rgb, image.width / image.height)
+
+
+def prepare_image(fileobj, original_size: Optional[int] = None) -> PreparedImage:
+    """
+    Decodes an uploaded image, applies its EXIF orientation, downscales it to the
+    resolution the vision model uses and re-encodes it as JPEG. Blocking; run it
+    in a worker thread.
+
+    Raises InvalidImage for unreadable input, and for images whose header gives
+    no dimensions or more than IMAGE_MAX_PIXELS, before the pixels are decoded.
+    """
+    try:
+        image = Image.open(fileobj)
+        width, height = image.size or (0, 0)
+        if width <= 0 or height <= 0:
+            raise InvalidImage("The image header doesn't give its dimensions.")
+        if width * height > IMAGE_MAX_PIXELS:
+            raise InvalidImage(f"The image has more than {IMAGE_MAX_PIXELS} pixels.")
+        scale = _target_scale(width, height)
+        if scale < 1.0:
+            # Lets the JPEG decoder skip straight to a reduced size (1/2, 1/4, 1/8).
+            image.draft("RGB", (max(1, int(width * scale)), max(1, int(height * scale))))
+        image = ImageOps.exif_transpose(image)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e))
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    scale = _target_scale(*image.size)
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+    return PreparedImage(
+        data=buffer.getvalue(),
+        mime_type="image/jpeg",
+        width=image.width,
+        height=image.height,
+        fingerprint=fingerprint_image(image),
+        original_size=original_size,
+    )
+
+
+def _normalize_keywords(keywords: Optional[str]) -> str:
+    return " ".join((keywords or "").lower().split())
+
+
+class CaptionCache:
+    """
+    Captions keyed on (platform, keywords) plus an ImageFingerprint. A lookup
+    matches the closest cached image within CAPTION_CACHE_MAX_DISTANCE bits, so
+    re-uploads of the same photo hit even after recompression or resizing.
+    """
+
+    def __init__(self, max_entries: int = CAPTION_CACHE_MAX_ENTRIES, ttl: float = CAPTION_CACHE_TTL,
+                 max_distance: int = CAPTION_CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # (platform, keywords) -> OrderedDict(fingerprint -> (expires_at, captions)),
+        # the outer dict ordered by last use of the bucket.
+        self._buckets = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def get(self, platform: str, keywords: Optional[str], fingerprint: ImageFingerprint, bypass: bool = False) -> Optional[List[str]]:
+        if bypass:
+            self.bypassed += 1
+            return None
+        key = (platform.strip().lower(), _normalize_keywords(keywords))
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            best = None
+            if bucket is not None:
+                for cached, (expires_at, captions) in list(bucket.items()):
+                    if expires_at < now:
+                        del bucket[cached]
+                        self._size -= 1
+                        continue
+                    distance = fingerprint.matches(cached, self.max_distance)
+                    if distance is not None and (best is None or distance < best[0]):
+                        best = (distance, cached, captions)
+            if best is None:
+                self.misses += 1
+                return None
+            bucket.move_to_end(best[1])
+            self._buckets.move_to_end(key)
+            self.hits += 1
+            return best[2]
+
+    def set(self, platform: str, keywords: Optional[str], fingerprint: ImageFingerprint, captions: List[str]):
+        key = (platform.strip().lower(), _normalize_keywords(keywords))
+        with self._lock:
+            bucket = self._buckets.setdefault(key, OrderedDict())
+            if fingerprint not in bucket:
+                self._size += 1
+            bucket[fingerprint] = (time.time() + self.ttl, captions)
+            bucket.move_to_end(fingerprint)
+            self._buckets.move_to_end(key)
+            while self._size > self.max_entries:
+                oldest_key, oldest_bucket = next(iter(self._buckets.items()))
+                if oldest_bucket:
+                    oldest_bucket.popitem(last=False)
+                    self._size -= 1
+                if not oldest_bucket:
+                    del self._buckets[oldest_key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+caption_cache = CaptionCache()
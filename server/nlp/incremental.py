@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+# A sentence runs up to terminal punctuation followed by whitespace (so "3.14" and
+# "e.g.x" stay intact), up to a line break, or up to the end of the text.
+_SENTENCE_RE = re.compile(r'\S.*?(?:[.!?…]+[\'"”’)\]]*(?=\s|$)|(?=\n)|$)', re.S)
+
+SENTENCE_CACHE_SIZE = int(os.getenv("SENTENCE_CACHE_SIZE", "20000"))
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """
+    Splits text into sentence spans using a cheap punctuation/line-break heuristic.
+
+    Returns a list of (start, end) character offsets into `text`. Whitespace between
+    sentences is not part of any span, so editing one sentence leaves the content
+    (and therefore the fingerprint) of its neighbours untouched.
+    """
+    spans = []
+    for m in _SENTENCE_RE.finditer(text):
+        start, end = m.start(), m.end()
+        # Trim trailing whitespace picked up by the lazy match at end of text.
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def fingerprint(sentence: str, *extra: str) -> str:
+    """Returns a stable fingerprint for a sentence plus any extra key material."""
+    h = hashlib.blake2b(sentence.encode('utf-8'), digest_size=16)
+    for part in extra:
+        h.update(b'\0')
+        h.update(part.encode('utf-8'))
+    return h.hexdigest()
+
+
+class SentenceCache:
+    """
+    Thread-safe LRU cache of per-sentence analyzer results.
+
+    Keys are (analyzer, fingerprint) pairs. Values hold offsets relative to the
+    start of the sentence, so a cached result can be reused wherever the
+    sentence moves to in the text.
+    """
+
+    def __init__(self, maxsize: int = SENTENCE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, analyzer: str, key: str):
+        with self._lock:
+            value = self._data.get((analyzer, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end((analyzer, key))
+            self.hits += 1
+            return value
+
+    def put(self, analyzer: str, key: str, value) -> None:
+        with self._lock:
+            self._data[(analyzer, key)] = value
+            self._data.move_to_end((analyzer, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+sentence_cache = SentenceCache()
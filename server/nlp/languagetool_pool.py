@@ -0,0 +1,234 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from metrics import LANGUAGETOOL_RESTARTS
+
+HEALTH_CHECK_TEXT = "This sentence is a health check."
+
+
+class _Instance:
+    def __init__(self, index: int, tool):
+        self.index = index
+        self.tool = tool
+        # check token -> monotonic start time, for every check in flight
+        self.checks: Dict[int, float] = {}
+        self.dispatched = 0
+        self.failed = False
+        self.retired_at: Optional[float] = None
+        self.killed = False
+
+
+class LanguageToolPool:
+    """
+    Spreads grammar checks over several LanguageTool instances, each with its own
+    server (a local Java process, or a remote URL).
+
+    Every check goes to the healthy instance with the fewest checks in flight. A
+    monitor thread replaces an instance when a check on it raises, when a check
+    has been running for longer than `check_timeout`, or when the health probe it
+    sends to idle instances every `health_interval` seconds fails. A replaced
+    instance stops receiving work and is closed once its in-flight checks return;
+    if they are still stuck after another `check_timeout` its server is killed to
+    release them.
+
+    `factory(index)` creates the LanguageTool for slot `index`; slots whose
+    factory call fails are retried by the monitor.
+    """
+
+    def __init__(self, factory: Callable[[int], object], size: int, check_timeout: float = 10.0, health_interval: float = 30.0, name: str = "languagetool-pool"):
+        self.factory = factory
+        self.size = max(1, size)
+        self.check_timeout = check_timeout
+        self.health_interval = health_interval
+        self.name = name
+        self._instances: List[Optional[_Instance]] = [None] * self.size
+        self._retired: List[_Instance] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._tokens = itertools.count()
+        self._thread = None
+        self._probes = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"{name}-probe")
+        self._checks = 0
+        self._failures = 0
+        self._restarts = 0
+
+    def _create(self, index: int):
+        try:
+            return self.factory(index)
+        except Exception as e:
+            print(f"Error starting LanguageTool instance {index}: {e}")
+            return None
+
+    def start(self) -> int:
+        """Starts every instance and the monitor; returns how many instances came up."""
+        # The first instance may have to download LanguageTool, which isn't safe to
+        # do from several threads at once; the rest start in parallel.
+        tools = [self._create(0)]
+        if self.size > 1:
+            with ThreadPoolExecutor(max_workers=self.size - 1) as starter:
+                tools.extend(starter.map(self._create, range(1, self.size)))
+        with self._lock:
+            for index, tool in enumerate(tools):
+                if tool is not None:
+                    self._instances[index] = _Instance(index, tool)
+        started = sum(tool is not None for tool in tools)
+        if started:
+            self._thread = threading.Thread(target=self._monitor, name=self.name, daemon=True)
+            self._thread.start()
+        return started
+
+    def _acquire(self):
+        with self._lock:
+            healthy = [i for i in self._instances if i is not None and not i.failed]
+            if not healthy:
+                return None, None
+            instance = min(healthy, key=lambda i: (len(i.checks), i.dispatched))
+            token = next(self._tokens)
+            instance.checks[token] = time.monotonic()
+            instance.dispatched += 1
+            self._checks += 1
+            return instance, token
+
+    def _release(self, instance: _Instance, token: int):
+        with self._lock:
+            instance.checks.pop(token, None)
+
+    def _mark_failed(self, instance: _Instance, error: Exception):
+        with self._lock:
+            self._failures += 1
+            if instance.failed or instance.retired_at is not None:
+                return
+            instance.failed = True
+        print(f"LanguageTool instance {instance.index} failed: {error}")
+        self._wake.set()
+
+    def _check_on(self, instance: _Instance, token: int, text: str):
+        try:
+            return instance.tool.check(text)
+        except Exception as e:
+            self._mark_failed(instance, e)
+            raise
+        finally:
+            self._release(instance, token)
+
+    def check(self, text: str):
+        """Checks `text` on the least busy instance, retrying once on another if that one fails."""
+        error = None
+        for _ in range(2):
+            instance, token = self._acquire()
+            if instance is None:
+                break
+            try:
+                return self._check_on(instance, token, text)
+            except Exception as e:
+                error = e
+        raise error or RuntimeError("No healthy LanguageTool instance is available.")
+
+    def _probe(self, instance: _Instance):
+        with self._lock:
+            if instance.failed or instance.retired_at is not None:
+                return
+            token = next(self._tokens)
+            instance.checks[token] = time.monotonic()
+        try:
+            self._check_on(instance, token, HEALTH_CHECK_TEXT)
+        except Exception:
+            pass
+
+    def _replace(self, index: int, reason: str):
+        with self._lock:
+            old = self._instances[index]
+            self._instances[index] = None
+            if old is not None:
+                old.retired_at = time.monotonic()
+                self._retired.append(old)
+                self._restarts += 1
+        if old is not None:
+            LANGUAGETOOL_RESTARTS.inc(reason=reason)
+            print(f"Restarting LanguageTool instance {index} ({reason}).")
+        tool = self._create(index)
+        if tool is None:
+            return
+        with self._lock:
+            if self._stopped.is_set():
+                replacement = None
+            else:
+                replacement = self._instances[index] = _Instance(index, tool)
+        if replacement is None:
+            self._close_tool(tool)
+
+    def _close_tool(self, tool):
+        try:
+            tool.close()
+        except Exception as e:
+            print(f"Error closing LanguageTool instance: {e}")
+
+    def _reap_retired(self):
+        now = time.monotonic()
+        with self._lock:
+            drained = [i for i in self._retired if not i.checks]
+            stuck = [i for i in self._retired if i.checks and not i.killed and now - i.retired_at > self.check_timeout]
+            self._retired = [i for i in self._retired if i.checks]
+            for instance in stuck:
+                instance.killed = True
+        for instance in drained + stuck:
+            self._close_tool(instance.tool)
+
+    def _monitor(self):
+        tick = max(0.1, min(self.health_interval, self.check_timeout) / 2)
+        next_probe = time.monotonic() + self.health_interval
+        while not self._stopped.is_set():
+            self._wake.wait(tick)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            now = time.monotonic()
+            probe_due = now >= next_probe
+            if probe_due:
+                next_probe = now + self.health_interval
+            with self._lock:
+                to_replace = []
+                for index, instance in enumerate(self._instances):
+                    if instance is None:
+                        # Slots that failed to start are retried at probe time.
+                        if probe_due:
+                            to_replace.append((index, "unavailable"))
+                    elif instance.failed:
+                        to_replace.append((index, "failed"))
+                    elif instance.checks and now - min(instance.checks.values()) > self.check_timeout:
+                        to_replace.append((index, "hung"))
+                idle = [i for i in self._instances if i is not None and not i.failed and not i.checks]
+            for index, reason in to_replace:
+                self._replace(index, reason)
+            self._reap_retired()
+            if probe_due:
+                for instance in idle:
+                    self._probes.submit(self._probe, instance)
+
+    def close(self):
+        """Stops the monitor and closes every instance."""
+        self._stopped.set()
+        self._wake.set()
+        with self._lock:
+            instances = [i for i in self._instances if i is not None] + self._retired
+            self._instances = [None] * self.size
+            self._retired = []
+        for instance in instances:
+            self._close_tool(instance.tool)
+        self._probes.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "healthy": sum(1 for i in self._instances if i is not None and not i.failed),
+                "in_flight": [len(i.checks) if i is not None else None for i in self._instances],
+                "retired": len(self._retired),
+                "checks": self._checks,
+                "failures": self._failures,
+                "restarts": self._restarts,
+            }
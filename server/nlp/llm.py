@@ -0,0 +1,194 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from metrics import LLM_REQUEST_SECONDS, LLM_RETRIES, LLM_TOKENS
+
+# Point OPENAI_BASE_URL at any OpenAI-compatible server (e.g. a local fake) to run
+# the LLM endpoints offline.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "16"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+
+_UNLOADED = object()
+_client_lock = threading.Lock()
+_client = _UNLOADED
+_semaphore = None
+
+
+def _load_client():
+    try:
+        import httpx
+        from openai import AsyncOpenAI
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+        # Retries are handled in chat_completion so they happen outside the
+        # concurrency limit and with jitter.
+        return AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=OPENAI_BASE_URL,
+            max_retries=0,
+            http_client=http_client,
+        )
+    except Exception as e:
+        print(f"Error initializing OpenAI client: {e}")
+        return None
+
+
+def get_client():
+    """Returns the shared AsyncOpenAI client, creating it on first use."""
+    global _client
+    if _client is _UNLOADED:
+        with _client_lock:
+            if _client is _UNLOADED:
+                _client = _load_client()
+    return _client
+
+
+def client_status() -> str:
+    if _client is _UNLOADED:
+        return "not_loaded"
+    return "loaded" if _client is not None else "failed"
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+def in_flight() -> int:
+    """Number of OpenAI calls currently holding a concurrency slot."""
+    if _semaphore is None:
+        return 0
+    return LLM_MAX_CONCURRENCY - _semaphore._value
+
+
+def _retry_delay(attempt: int, error) -> float:
+    """Full-jitter exponential backoff, stretched to any Retry-After the server sent."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, min(LLM_BACKOFF_MAX, float(response.headers.get("retry-after", 0))))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+def _is_retryable(error) -> bool:
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _record_usage(helper: str, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, helper=helper, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, helper=helper, kind="completion")
+
+
+async def chat_completion(helper: str = "other", **kwargs):
+    """
+    Calls chat.completions.create on the shared client.
+
+    At most LLM_MAX_CONCURRENCY calls are in flight per process. Rate limits (429),
+    server errors (5xx) and connection failures are retried up to LLM_MAX_RETRIES
+    times; the concurrency slot is released while backing off. Latency, retries
+    and token usage are recorded in metrics under `helper`.
+    """
+    client = get_client()
+    if not client:
+        raise ConnectionError("OpenAI client is not initialized.")
+
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            async with _get_semaphore():
+                response = await client.chat.completions.create(**kwargs)
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, helper=helper, outcome="ok")
+            _record_usage(helper, getattr(response, "usage", None))
+            return response
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, helper=helper, outcome="error")
+                raise
+            delay = _retry_delay(attempt, e)
+            print(f"OpenAI call failed ({e.__class__.__name__}), retrying in {delay:.2f}s...")
+            LLM_RETRIES.inc(helper=helper)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def stream_chat_completion(helper: str = "other", **kwargs):
+    """
+    Streams chat.completions.create on the shared client, yielding content deltas
+    as they arrive. The concurrency slot is held until the stream is consumed.
+    Retryable failures are retried as in chat_completion, but only before the
+    first delta has been yielded.
+    """
+    client = get_client()
+    if not client:
+        raise ConnectionError("OpenAI client is not initialized.")
+
+    started = time.perf_counter()
+    outcome = "error"
+    attempt = 0
+    first_delta = False
+    try:
+        while True:
+            try:
+                async with _get_semaphore():
+                    # The final chunk then carries the token usage (and no choices).
+                    stream = await client.chat.completions.create(
+                        stream=True, stream_options={"include_usage": True}, **kwargs
+                    )
+                    async for chunk in stream:
+                        _record_usage(helper, getattr(chunk, "usage", None))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            first_delta = True
+                            yield chunk.choices[0].delta.content
+                outcome = "ok"
+                return
+            except Exception as e:
+                if first_delta or attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _retry_delay(attempt, e)
+                print(f"OpenAI stream failed ({e.__class__.__name__}), retrying in {delay:.2f}s...")
+                LLM_RETRIES.inc(helper=helper)
+                attempt += 1
+                await asyncio.sleep(delay)
+    except GeneratorExit:
+        # The consumer stopped reading (e.g. the client disconnected).
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, helper=helper, outcome=outcome)
+
+
+async def aclose():
+    global _client
+    if _client is not _UNLOADED and _client is not None:
+        await _client.close()
+    _client = _UNLOADED
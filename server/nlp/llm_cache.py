@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # "memory", "disk" or "none"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry."""
+
+    is_blocking = False
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DiskBackend:
+    """
+    SQLite-file store with per-entry expiry and least-recently-used eviction.
+    Values must be JSON-serialisable. Survives restarts and can be shared by
+    several worker processes pointing at the same file.
+    """
+
+    is_blocking = True
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def _normalize_tags(tags) -> list:
+    return sorted({t.strip().lstrip("#@").lower() for t in (tags or []) if t and t.strip()})
+
+
+class LLMCache:
+    """
+    Caches LLM responses keyed on the normalized prompt inputs of an endpoint,
+    with hit/miss/bypass counters per endpoint. A bypassed lookup skips the read
+    only; the fresh response still replaces the cached one.
+    """
+
+    def __init__(self, backend=None, ttl: float = LLM_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._counters = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+    def make_key(self, endpoint: str, text: str, platform: Optional[str] = None, hashtags=None, mentions=None,
+                 adjective: Optional[str] = None, inspiration_ids=None) -> str:
+        parts = {
+            "endpoint": endpoint,
+            "text": _normalize_text(text),
+            "platform": (platform or "").strip().lower(),
+            "hashtags": _normalize_tags(hashtags),
+            "mentions": _normalize_tags(mentions),
+            "adjective": (adjective or "").strip().lower(),
+            "inspiration_ids": sorted(set(inspiration_ids or [])),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    async def get(self, endpoint: str, key: str, bypass: bool = False):
+        if self.backend is None:
+            return None
+        if bypass:
+            self._counters[endpoint]["bypassed"] += 1
+            return None
+        if self.backend.is_blocking:
+            value = await asyncio.to_thread(self.backend.get, key)
+        else:
+            value = self.backend.get(key)
+        self._counters[endpoint]["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, key: str, value):
+        if self.backend is None:
+            return
+        if self.backend.is_blocking:
+            await asyncio.to_thread(self.backend.set, key, value, self.ttl)
+        else:
+            self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> dict:
+        endpoints = {}
+        for endpoint, counts in self._counters.items():
+            lookups = counts["hits"] + counts["misses"]
+            endpoints[endpoint] = dict(counts, hit_rate=(counts["hits"] / lookups) if lookups else 0.0)
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "ttl": self.ttl,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "endpoints": endpoints,
+        }
+
+
+def _make_backend(name: str):
+    if name == "disk":
+        return DiskBackend()
+    if name == "memory":
+        return MemoryBackend()
+    return None
+
+
+llm_cache = LLMCache(_make_backend(LLM_CACHE_BACKEND))
@@ -0,0 +1,49 @@
+import re
+from bisect import bisect_left
+from typing import Tuple
+
+# Characters outside the Basic Multilingual Plane (most emoji) take two UTF-16 code
+# units, everything else takes one.
+_ASTRAL_RE = re.compile('[\U00010000-\U0010FFFF]')
+
+
+class Utf16OffsetMap:
+    """
+    Maps Python character offsets in one text to UTF-16 code unit offsets, which is
+    what the extension's JavaScript string indices use.
+
+    Built once per analysis and shared by every analyzer. The UTF-16 offset of
+    character i is i plus the number of astral characters before it, so the map
+    keeps the sorted positions of astral characters (a sparse prefix sum) and
+    answers each lookup with a binary search. Text without astral characters, the
+    common case, maps every offset to itself.
+    """
+
+    __slots__ = ("_astral",)
+
+    def __init__(self, text: str):
+        self._astral = None if text.isascii() else [m.start() for m in _ASTRAL_RE.finditer(text)] or None
+
+    @property
+    def is_identity(self) -> bool:
+        return self._astral is None
+
+    def offset(self, index: int) -> int:
+        if self._astral is None:
+            return index
+        return index + bisect_left(self._astral, index)
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        if self._astral is None:
+            return start, end
+        return self.offset(start), self.offset(end)
+
+    def index(self, offset: int) -> int:
+        """
+        The inverse of offset(): the character index at UTF-16 offset `offset`. An
+        offset inside a surrogate pair maps to the start of that character.
+        """
+        if self._astral is None:
+            return offset
+        units = [index + n for n, index in enumerate(self._astral)]
+        return offset - bisect_left(units, offset)
@@ -0,0 +1,202 @@
+import asyncio
+import math
+import os
+import re
+import zlib
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Width of the hashed feature space. Rows are float32, so each indexed
+# inspiration costs SIMILARITY_DIM * 4 bytes.
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", "1024"))
+SIMILARITY_MAX_USERS = int(os.getenv("SIMILARITY_MAX_USERS", "200"))
+
+_TOKEN_RE = re.compile(r"[#@]?\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its me my of on or our so that the this to "
+    "was we were what when with you your".split()
+)
+
+
+def _tokens(text: str) -> List[str]:
+    return [t.lstrip("#@") for t in _TOKEN_RE.findall(text.lower()) if t.lstrip("#@") not in _STOPWORDS]
+
+
+def vectorize(text: str, dim: int = SIMILARITY_DIM) -> np.ndarray:
+    """
+    Hashing-vectorizer embedding: unigrams and bigrams hashed into `dim` signed
+    buckets with sublinear term frequency, L2-normalised so a dot product is the
+    cosine similarity. Deterministic across processes (crc32, not hash()).
+    """
+    tokens = _tokens(text)
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature, count in features.items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        vec[h % dim] += (1.0 if (h >> 31) & 1 else -1.0) * (1.0 + math.log(count))
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+class InspirationIndex:
+    """
+    One user's inspirations as rows of a dense matrix. Adds, replacements and
+    removals are O(dim); a query is a single matrix-vector product.
+    """
+
+    def __init__(self, dim: int = SIMILARITY_DIM):
+        self.dim = dim
+        # The user's inspirations version this index reflects.
+        self.version: Optional[int] = None
+        self._matrix = np.zeros((16, dim), dtype=np.float32)
+        self._ids: List[int] = []
+        self._row_of = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, inspiration_id: int, text: str):
+        vec = vectorize(text, self.dim)
+        row = self._row_of.get(inspiration_id)
+        if row is None:
+            row = len(self._ids)
+            if row == self._matrix.shape[0]:
+                grown = np.zeros((row * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix
+                self._matrix = grown
+            self._ids.append(inspiration_id)
+            self._row_of[inspiration_id] = row
+        self._matrix[row] = vec
+
+    def remove(self, inspiration_id: int):
+        row = self._row_of.pop(inspiration_id, None)
+        if row is None:
+            return
+        last = len(self._ids) - 1
+        if row != last:
+            # Move the last row into the hole so the live rows stay contiguous.
+            moved_id = self._ids[last]
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = moved_id
+            self._row_of[moved_id] = row
+        self._ids.pop()
+        self._matrix[last] = 0
+
+    def query(self, text: str, k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """Returns up to `k` (inspiration_id, cosine) pairs, most similar first."""
+        n = len(self._ids)
+        if n == 0 or k <= 0:
+            return []
+        scores = self._matrix[:n] @ vectorize(text, self.dim)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[row], float(scores[row])) for row in top if scores[row] > min_score]
+
+
+def inspiration_text(post_text: Optional[str], tags: Optional[str]) -> str:
+    return f"{post_text or ''} {tags or ''}"
+
+
+class SimilarityIndexRegistry:
+    """
+    Per-user InspirationIndex instances, built from the database on first use and
+    then kept current by add/remove calls from the inspiration endpoints. The
+    least recently used users' indexes are dropped past SIMILARITY_MAX_USERS.
+
+    Every inspiration write bumps the user's version in the database. A change
+    made here advances the index to the write's version when it directly follows
+    the one the index reflects. Other worker processes change inspirations
+    without telling this one, so get() takes the user's current version and
+    rebuilds an index that reflects a different one.
+    """
+
+    def __init__(self, max_users: int = SIMILARITY_MAX_USERS, dim: int = SIMILARITY_DIM):
+        self.max_users = max_users
+        self.dim = dim
+        self._indexes = OrderedDict()
+        self._building = {}
+        # Changes that arrive while a user's index is being built, replayed after.
+        self._pending = {}
+
+    def loaded(self, user_id: int) -> Optional[InspirationIndex]:
+        return self._indexes.get(user_id)
+
+    async def get(self, user_id: int, load_rows, version: Optional[int] = None) -> InspirationIndex:
+        """
+        Returns the user's index, building it on first use or when it wasn't
+        built from `version`. `load_rows` is an async callable returning
+        (id, post_text, tags) rows for the user.
+        """
+        index = self._indexes.get(user_id)
+        if index is not None and index.version == version:
+            self._indexes.move_to_end(user_id)
+            return index
+        if index is not None:
+            # Stale: rebuild from the database.
+            del self._indexes[user_id]
+        # Concurrent first requests for the same user share one build.
+        building = self._building.get(user_id)
+        if building is None:
+            self._pending[user_id] = []
+            building = asyncio.ensure_future(self._build(user_id, load_rows, version))
+            self._building[user_id] = building
+        return await asyncio.shield(building)
+
+    async def _build(self, user_id: int, load_rows, version: Optional[int]) -> InspirationIndex:
+        try:
+            rows = await load_rows()
+
+            def build():
+                index = InspirationIndex(self.dim)
+                index.version = version
+                for inspiration_id, post_text, tags in rows:
+                    index.add(inspiration_id, inspiration_text(post_text, tags))
+                return index
+
+            index = await asyncio.to_thread(build)
+            # Rows loaded after the version was read may already hold these
+            # changes; replaying them is harmless.
+            for version, op, args in self._pending.get(user_id, []):
+                self._apply_to(index, version, op, args)
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+            return index
+        finally:
+            self._building.pop(user_id, None)
+            self._pending.pop(user_id, None)
+
+    @staticmethod
+    def _apply_to(index: InspirationIndex, version: int, op: str, args) -> bool:
+        """Applies a change if it is the next one after the index's version."""
+        if index.version is None or version != index.version + 1:
+            return False
+        getattr(index, op)(*args)
+        index.version = version
+        return True
+
+    def _apply(self, user_id: int, version: int, op: str, *args):
+        index = self._indexes.get(user_id)
+        if index is not None:
+            if not self._apply_to(index, version, op, args):
+                # A change from elsewhere came in between; rebuild on next use.
+                del self._indexes[user_id]
+        elif user_id in self._pending:
+            self._pending[user_id].append((version, op, args))
+
+    def add(self, user_id: int, inspiration_id: int, post_text: Optional[str], tags: Optional[str], version: int):
+        """Records an added or edited inspiration; `version` is the user's version after the write."""
+        self._apply(user_id, version, "add", inspiration_id, inspiration_text(post_text, tags))
+
+    def remove(self, user_id: int, inspiration_id: int, version: int):
+        """Records a deleted inspiration; `version` is the user's version after the write."""
+        self._apply(user_id, version, "remove", inspiration_id)
+
+
+similarity_index = SimilarityIndexRegistry()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Annotated, Optional, List
 from datetime import datetime
 
 # Token Schemas
@@ -26,9 +26,30 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class Principal(BaseModel):
+    """The minimal view of a user needed to authenticate a request."""
+    id: int
+    email: str
+    is_active: bool
+
+    class Config:
+        from_attributes = True
+
 class WordCreate(BaseModel):
     word: str
 
+# Limits on one /dictionary/import request.
+DICTIONARY_IMPORT_MAX_WORDS = 10000
+DICTIONARY_WORD_MAX_LENGTH = 100
+
+class WordListImport(BaseModel):
+    words: List[Annotated[str, Field(max_length=DICTIONARY_WORD_MAX_LENGTH)]] = Field(..., max_length=DICTIONARY_IMPORT_MAX_WORDS)
+
+class WordListImportResult(BaseModel):
+    imported: int
+    skipped: int
+    invalid: List[str] = []
+
 class UserWord(BaseModel):
     id: int
     word: str
@@ -43,6 +64,26 @@ class AnalysisRequest(BaseModel):
     field: Optional[str] = None
     enabled_analyzers: Optional[dict] = None
 
+# /ws/analyze session messages
+class TextDelta(BaseModel):
+    """Replaces text[start:end] with `text`; offsets are UTF-16 code units, as in JavaScript."""
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+class AnalysisSessionMessage(BaseModel):
+    type: str
+    token: Optional[str] = None
+    field: Optional[str] = None
+    # Required for "analyze" messages.
+    seq: Optional[int] = None
+    text: Optional[str] = None
+    delta: Optional[TextDelta] = None
+    length: Optional[int] = None
+    platform: Optional[str] = None
+    enabled_analyzers: Optional[dict] = None
+    incremental: Optional[bool] = None
+
 # Inspiration Schemas
 class InspirationBase(BaseModel):
     post_text: Optional[str] = None
@@ -61,11 +102,20 @@ class Inspiration(InspirationBase):
     class Config:
         from_attributes = True
 
+class InspirationSearchResult(BaseModel):
+    inspiration: Inspiration
+    snippet: str
+    score: float
+
 # Tone Adjust Schemas
 class ToneAdjustRequest(BaseModel):
     text: str
     adjective: str
     inspiration_ids: Optional[List[int]] = None
+    # Without inspiration_ids (None, not []), pick the saved inspirations most similar to the text.
+    auto_inspirations: Optional[bool] = True
+    inspiration_count: Optional[int] = Field(3, ge=0, le=10)
+    no_cache: Optional[bool] = False
 
 class ToneAdjustResponse(BaseModel):
     suggestions: List[str]
@@ -76,6 +126,7 @@ class PostAnalysisRequest(BaseModel):
     platform: str
     hashtags: Optional[List[str]] = []
     mentions: Optional[List[str]] = []
+    no_cache: Optional[bool] = False
 
 class PostAnalysisResponse(BaseModel):
     summary: str
@@ -85,6 +136,7 @@ class PostAnalysisResponse(BaseModel):
 # Improve Post Schemas
 class ImprovePostRequest(BaseModel):
     post_text: str
+    no_cache: Optional[bool] = False
 
 class ImprovePostResponse(BaseModel):
     engagement_suggestions: List[str]
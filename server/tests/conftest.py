@@ -0,0 +1,48 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read at import time, so they're fixed before the app is imported.
+_workdir = tempfile.mkdtemp(prefix="wordwise-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/wordwise.db"
+os.environ["ANALYSIS_CACHE_ENABLED"] = "false"
+os.environ["WARMUP_ON_STARTUP"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_emails = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    # One app lifetime for the whole run: shutdown stops the analysis engine for good.
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
+
+
+async def _create_user(email: str, password: str):
+    import auth
+    import database
+    import models
+
+    async with database.SessionLocal() as db:
+        user = models.User(email=email, hashed_password=auth.get_password_hash(password))
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user.id
+
+
+@pytest.fixture
+def user(client):
+    """A fresh user: (id, email, Authorization headers)."""
+    email = f"user{next(_emails)}@example.com"
+    user_id = client.portal.call(_create_user, email, "password")
+    token = client.post("/token", data={"username": email, "password": "password"}).json()["access_token"]
+    return user_id, email, {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,52 @@
+import asyncio
+
+from analysis_session import AnalysisSession
+
+
+async def _analyze(field, text, state):
+    # One suggestion per "teh", like a spelling rule.
+    suggestions, start = [], text.find("teh")
+    while start != -1:
+        suggestions.append({"type": "grammar", "message": "Typo", "replacements": ["the"], "start": start, "end": start + 3})
+        start = text.find("teh", start + 1)
+    return {"suggestions": suggestions, "analyzers": {"grammar": "ok"}}
+
+
+async def _exchange(messages):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    with AnalysisSession(_analyze, send) as session:
+        for message in messages:
+            await session.handle(message)
+            state = session.fields.get(message.get("field"))
+            while state is not None and state.task is not None:
+                await asyncio.sleep(0.01)
+    return sent
+
+
+def test_edit_before_a_suggestion_moves_it_instead_of_replacing_it():
+    first, second = asyncio.run(_exchange([
+        {"type": "analyze", "field": "post", "seq": 1, "text": "teh cat and teh dog"},
+        {"type": "analyze", "field": "post", "seq": 2, "delta": {"start": 0, "end": 0, "text": "Oh "}},
+    ]))
+
+    assert len(first["added"]) == 2
+    assert second["added"] == [] and second["removed"] == []
+    assert second["moved"] == [
+        {"id": first["added"][0]["id"], "start": 3, "end": 6},
+        {"id": first["added"][1]["id"], "start": 15, "end": 18},
+    ]
+
+
+def test_missing_or_stale_seq_is_an_error():
+    missing, _, stale = asyncio.run(_exchange([
+        {"type": "analyze", "field": "post", "text": "Hello."},
+        {"type": "analyze", "field": "post", "seq": 2, "text": "Hello."},
+        {"type": "analyze", "field": "post", "seq": 2, "text": "Hello again."},
+    ]))
+
+    assert missing["type"] == "error" and missing["code"] == "invalid_message"
+    assert stale["type"] == "error" and stale["code"] == "stale_seq"
@@ -0,0 +1,39 @@
+from nlp import analysis
+
+TEXT = "I am so happy about how this post turned out today."
+
+
+def _broken_classifier(texts, **kwargs):
+    raise RuntimeError("emotion model failed")
+
+
+def test_emotion_failure_is_a_tone_error(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_emotion_classifier", lambda: _broken_classifier)
+    _, _, headers = user
+
+    response = client.post("/analyze/", headers=headers, json={"text": TEXT, "enabled_analyzers": {"tone": True}})
+    assert response.status_code == 200
+    assert response.json()["analyzers"]["tone"] == "error"
+
+    batch = client.post("/analyze/batch", headers=headers, json={"items": [{"text": TEXT, "enabled_analyzers": {"tone": True}}]})
+    assert batch.status_code == 200
+    assert batch.json()["results"][0]["analyzers"]["tone"] == "error"
+
+
+def test_missing_emotion_model_is_a_tone_error(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_emotion_classifier", lambda: None)
+    _, _, headers = user
+
+    response = client.post("/analyze/", headers=headers, json={"text": TEXT, "enabled_analyzers": {"tone": True}})
+    assert response.json()["analyzers"]["tone"] == "error"
+
+
+def test_missing_language_tool_is_a_grammar_error(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_tool", lambda: None)
+    _, _, headers = user
+
+    response = client.post("/analyze/", headers=headers, json={"text": TEXT, "enabled_analyzers": {"grammar": True}})
+    assert response.json()["analyzers"] == {"grammar": "error"}
+
+    batch = client.post("/analyze/batch", headers=headers, json={"items": [{"text": TEXT, "enabled_analyzers": {"grammar": True}}]})
+    assert batch.json()["results"][0]["analyzers"] == {"grammar": "error"}
@@ -0,0 +1,17 @@
+import pytest
+
+from nlp.batching import MicroBatcher
+
+
+def test_short_batch_result_fails_every_caller():
+    batcher = MicroBatcher(lambda items: items[:-1], max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="results for"):
+            future.result(timeout=2)
+
+
+def test_results_match_their_items():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(6)]
+    assert [f.result(timeout=2) for f in futures] == [0, 2, 4, 6, 8, 10]
@@ -0,0 +1,18 @@
+import schemas
+
+
+def test_import_counts_only_new_words(client, user):
+    _, _, headers = user
+    assert client.post("/dictionary/add", headers=headers, json={"word": "WordWise"}).status_code == 201
+
+    response = client.post("/dictionary/import", headers=headers, json={"words": ["WordWise", "bagztech", "two words", "bagztech"]})
+    assert response.status_code == 200
+    assert response.json() == {"imported": 1, "skipped": 1, "invalid": ["two words"]}
+
+
+def test_import_limits(client, user):
+    _, _, headers = user
+    too_long = "x" * (schemas.DICTIONARY_WORD_MAX_LENGTH + 1)
+    assert client.post("/dictionary/import", headers=headers, json={"words": [too_long]}).status_code == 422
+    too_many = [f"w{i}" for i in range(schemas.DICTIONARY_IMPORT_MAX_WORDS + 1)]
+    assert client.post("/dictionary/import", headers=headers, json={"words": too_many}).status_code == 422
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+from PIL import Image
+
+import main
+from nlp import images
+from nlp.images import IMAGE_MAX_UPLOAD_BYTES, InvalidImage, prepare_image
+
+
+def _png(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_downscales_to_the_model_resolution():
+    prepared = prepare_image(_png(3000, 1000))
+    assert (prepared.width, prepared.height) == (2048, 683)
+
+
+def test_rejects_images_over_the_pixel_cap_before_decoding(monkeypatch):
+    monkeypatch.setattr(images, "IMAGE_MAX_PIXELS", 100 * 100)
+    with pytest.raises(InvalidImage):
+        prepare_image(_png(101, 100))
+
+
+def test_rejects_images_without_dimensions(monkeypatch):
+    class NoSize:
+        size = None
+
+    monkeypatch.setattr(images.Image, "open", lambda fileobj: NoSize())
+    with pytest.raises(InvalidImage):
+        prepare_image(io.BytesIO(b"anything"))
+
+
+def test_caption_upload_over_the_limit_is_rejected_before_parsing(client, user):
+    _, _, headers = user
+    limit = IMAGE_MAX_UPLOAD_BYTES + main.CAPTION_FORM_OVERHEAD_BYTES
+
+    declared = client.post("/caption/generate", headers={**headers, "Content-Length": str(limit + 1)}, content=b"")
+    assert declared.status_code == 413
+
+    def chunks():
+        for _ in range(limit // (1024 * 1024) + 2):
+            yield b"x" * (1024 * 1024)
+
+    streamed = client.post(
+        "/caption/generate",
+        headers={**headers, "Content-Type": "multipart/form-data; boundary=x"},
+        content=chunks(),
+    )
+    assert streamed.status_code == 413
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from nlp import analysis
+from nlp.incremental import sentence_cache
+
+
+class RecordingTool:
+    """Flags every occurrence of "teh" and records each text it checks."""
+
+    def __init__(self):
+        self.checked = []
+
+    def check(self, text):
+        self.checked.append(text)
+        matches = []
+        start = text.find("teh")
+        while start != -1:
+            matches.append(SimpleNamespace(message="typo", replacements=["the"], offset=start, errorLength=3, category="TYPOS", ruleId="TEH"))
+            start = text.find("teh", start + 1)
+        return matches
+
+
+def _flagged(text, matches):
+    return [text[m["offset"]:m["offset"] + m["length"]] for m in matches]
+
+
+def test_edited_sentences_share_one_check(monkeypatch):
+    tool = RecordingTool()
+    monkeypatch.setattr(analysis, "get_tool", lambda: tool)
+    monkeypatch.setattr(analysis, "GRAMMAR_INCREMENTAL_MAX_MISSES", 3)
+    sentence_cache.clear()
+
+    first = "One is fine. Two has teh typo. Three is fine."
+    analysis._grammar_matches(first, incremental=True)
+    tool.checked.clear()
+
+    edited = "One is fine now. Two has teh typo. Three has teh typo too."
+    matches = analysis._grammar_matches(edited, incremental=True)
+    assert len(tool.checked) == 1
+    assert "Two has" not in tool.checked[0]
+    assert [m["offset"] for m in matches] == [edited.find("teh"), edited.rfind("teh")]
+    assert _flagged(edited, matches) == ["teh", "teh"]
+
+
+def test_many_edited_sentences_check_the_whole_text(monkeypatch):
+    tool = RecordingTool()
+    monkeypatch.setattr(analysis, "get_tool", lambda: tool)
+    monkeypatch.setattr(analysis, "GRAMMAR_INCREMENTAL_MAX_MISSES", 1)
+    sentence_cache.clear()
+
+    text = "A teh b. C d. E teh f."
+    matches = analysis._grammar_matches(text, incremental=True)
+    assert tool.checked == [text]
+    assert _flagged(text, matches) == ["teh", "teh"]
+
+    tool.checked.clear()
+    assert _flagged(text, analysis._grammar_matches(text, incremental=True)) == ["teh", "teh"]
+    assert tool.checked == []
@@ -0,0 +1,62 @@
+import crud
+import main
+import schemas
+from database import SessionLocal
+from nlp.similarity import similarity_index
+
+
+def _create(client, headers, post_text, tags=""):
+    response = client.post("/inspiration", headers=headers, json={"post_text": post_text, "platform": "x", "tags": tags})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+async def _select(user_id, **fields):
+    request = schemas.ToneAdjustRequest(text="A morning coffee ritual before work", adjective="warm", **fields)
+    async with SessionLocal() as db:
+        return [i.id for i in await main._select_inspirations(request, user_id, db)]
+
+
+async def _insert_elsewhere(user_id, post_text):
+    # Written without telling this process' index, as another worker would.
+    async with SessionLocal() as db:
+        inspiration, _ = await crud.create_inspiration(
+            db, schemas.InspirationCreate(post_text=post_text, platform="x", tags=""), user_id
+        )
+        return inspiration.id
+
+
+def test_empty_inspiration_ids_means_none(client, user):
+    user_id, _, headers = user
+    _create(client, headers, "My morning coffee ritual before work")
+
+    assert client.portal.call(lambda: _select(user_id, inspiration_ids=[])) == []
+    assert client.portal.call(lambda: _select(user_id)) != []
+
+
+def test_auto_selection_sees_inspirations_added_by_other_workers(client, user):
+    user_id, _, headers = user
+    _create(client, headers, "Sunset over the harbour tonight")
+    # Builds this process' index.
+    assert client.portal.call(lambda: _select(user_id)) == []
+
+    added = client.portal.call(_insert_elsewhere, user_id, "A morning coffee ritual before work")
+    assert client.portal.call(lambda: _select(user_id)) == [added]
+
+
+def test_local_changes_advance_the_index_without_a_rebuild(client, user):
+    user_id, _, headers = user
+    _create(client, headers, "Sunset over the harbour tonight")
+    assert client.portal.call(lambda: _select(user_id)) == []
+    index = similarity_index.loaded(user_id)
+
+    added = _create(client, headers, "A morning coffee ritual before work")
+    assert similarity_index.loaded(user_id) is index
+    assert index.version == client.portal.call(_version, user_id)
+    assert client.portal.call(lambda: _select(user_id)) == [added]
+    assert similarity_index.loaded(user_id) is index
+
+
+async def _version(user_id):
+    async with SessionLocal() as db:
+        return await crud.get_inspiration_version(db, user_id=user_id)
@@ -0,0 +1,27 @@
+import json
+from types import SimpleNamespace
+
+from nlp import analysis, llm
+
+
+def _reply(payload):
+    async def chat_completion(helper="other", **kwargs):
+        message = SimpleNamespace(content=json.dumps(payload))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+    return chat_completion
+
+
+def test_wrongly_shaped_reply_is_not_cached(client, monkeypatch):
+    monkeypatch.setattr(analysis, "get_openai_client", lambda: object())
+    monkeypatch.setattr(llm, "chat_completion", _reply({"summary": "Fine.", "key_factors": "not a list"}))
+    post = {"post_text": "Shape check post", "platform": "x", "hashtags": [], "mentions": []}
+
+    result = client.portal.call(lambda: analysis.analyze_post_with_ai(**post))
+    assert result["key_factors"] == [] and result["summary"].startswith("Could not analyze")
+
+    good = {"summary": "Fine.", "key_factors": ["Clear"], "recommendations": ["Ask a question"]}
+    monkeypatch.setattr(llm, "chat_completion", _reply(good))
+    assert client.portal.call(lambda: analysis.analyze_post_with_ai(**post)) == good
+
+    monkeypatch.setattr(analysis, "get_openai_client", lambda: None)
+    assert client.portal.call(lambda: analysis.analyze_post_with_ai(**post)) == good
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from metrics import ANALYSES_CANCELLED
+from nlp import analysis
+
+
+def _slow_grammar(text, user_dictionary, incremental, offsets):
+    time.sleep(0.5)
+    return []
+
+
+def test_newer_request_supersedes_running_analysis(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_tool", lambda: object())
+    monkeypatch.setattr(analysis, "_grammar_suggestions", _slow_grammar)
+    _, _, headers = user
+    cancelled_before = ANALYSES_CANCELLED.value(stage="grammar")
+    responses = {}
+
+    def analyze(seq):
+        responses[seq] = client.post("/analyze/", headers=headers, json={
+            "text": f"Draft number {seq}.", "field": "post", "session_id": "tab-1", "seq": seq,
+            "enabled_analyzers": {"grammar": True},
+        })
+
+    first = threading.Thread(target=analyze, args=(1,))
+    first.start()
+    time.sleep(0.2)
+    analyze(2)
+    first.join()
+
+    assert responses[1].status_code == 409
+    assert responses[2].status_code == 200
+    assert responses[2].json()["analyzers"] == {"grammar": "ok"}
+    assert ANALYSES_CANCELLED.value(stage="grammar") == cancelled_before + 1
+
+    # Arrives after a newer request for the field: refused without analysis.
+    assert client.post("/analyze/", headers=headers, json={"text": "Late.", "field": "post", "session_id": "tab-1", "seq": 1}).status_code == 409
@@ -0,0 +1,45 @@
+import json
+
+from nlp import analysis, llm
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _fake_stream(*deltas, error=None):
+    async def stream_chat_completion(helper="other", **kwargs):
+        for delta in deltas:
+            yield delta
+        if error is not None:
+            raise error
+    return stream_chat_completion
+
+
+def test_error_midway_ends_the_stream_with_an_error_line(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_openai_client", lambda: object())
+    monkeypatch.setattr(llm, "stream_chat_completion", _fake_stream("1. First rewrite\n", "2. Sec", error=RuntimeError("connection reset")))
+    _, _, headers = user
+
+    response = client.post("/tone-adjust/stream", headers=headers, json={"text": "Hello there", "adjective": "warm", "inspiration_ids": [], "no_cache": True})
+    assert response.status_code == 200
+    lines = _lines(response)
+    assert lines[0] == {"suggestion": "First rewrite"}
+    assert "error" in lines[-1]
+    assert {"done": True} not in lines
+
+
+def test_cached_suggestions_are_served_without_an_openai_client(client, user, monkeypatch):
+    monkeypatch.setattr(analysis, "get_openai_client", lambda: object())
+    monkeypatch.setattr(llm, "stream_chat_completion", _fake_stream("1. Cached rewrite\n"))
+    _, _, headers = user
+    body = {"text": "Cache me please", "adjective": "bold", "inspiration_ids": []}
+    assert _lines(client.post("/tone-adjust/stream", headers=headers, json=body))[-1] == {"done": True}
+
+    monkeypatch.setattr(analysis, "get_openai_client", lambda: None)
+    response = client.post("/tone-adjust/stream", headers=headers, json=body)
+    assert response.status_code == 200
+    assert _lines(response) == [{"suggestion": "Cached rewrite"}, {"done": True}]
+
+    uncached = client.post("/tone-adjust/stream", headers=headers, json=dict(body, text="Never seen before"))
+    assert uncached.status_code == 503
@@ -0,0 +1,27 @@
+import auth
+import crud
+from database import SessionLocal
+
+
+async def _set_active(user_id, is_active):
+    async with SessionLocal() as db:
+        await crud.set_user_active(db, user_id=user_id, is_active=is_active)
+
+
+def _analyze(client, headers):
+    return client.post("/analyze/", headers=headers, json={"text": "Hi.", "enabled_analyzers": {}})
+
+
+def test_deactivating_a_user_drops_their_cached_tokens(client, user):
+    user_id, _, headers = user
+    # Authenticates once so the principal is cached.
+    assert _analyze(client, headers).status_code == 200
+    token = headers["Authorization"].split(" ", 1)[1]
+    assert token in auth._principal_cache
+
+    client.portal.call(_set_active, user_id, False)
+
+    assert token not in auth._principal_cache
+    response = _analyze(client, headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
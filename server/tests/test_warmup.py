@@ -0,0 +1,29 @@
+import spacy
+import spacy.cli
+
+from nlp import analysis
+
+
+def test_spacy_load_failure_is_remembered_and_reported(client, user, monkeypatch):
+    downloads = []
+
+    def missing_model(name, **kwargs):
+        raise OSError(f"[E050] Can't find model '{name}'")
+
+    def failed_download(name):
+        downloads.append(name)
+        raise SystemExit(1)
+
+    monkeypatch.setattr(spacy, "load", missing_model)
+    monkeypatch.setattr(spacy.cli, "download", failed_download)
+    monkeypatch.setattr(analysis, "_nlp", analysis._UNLOADED)
+    monkeypatch.setattr(analysis, "_warmed_up", False)
+
+    assert analysis.warmup()["spacy"] == "failed"
+    assert analysis.get_nlp() is None
+    assert len(downloads) == 1
+
+    _, _, headers = user
+    response = client.post("/analyze/", headers=headers, json={"text": "The post was written by me.", "enabled_analyzers": {"style": True}})
+    assert response.status_code == 200
+    assert response.json()["analyzers"]["style"] == "error"